@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -45,12 +46,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "shopping_list.instrumentation.InstrumentationMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "shopping_list.routers.PrimaryStickinessMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -78,10 +81,88 @@ WSGI_APPLICATION = "core.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
+# DJANGO_DATABASE_PROFILE=production keeps database connections open: pooled
+# for PostgreSQL (DJANGO_DATABASE_ENGINE=postgresql, needs psycopg[pool]),
+# persistent and in WAL mode for SQLite.
+
+DATABASE_PROFILE = os.environ.get("DJANGO_DATABASE_PROFILE", "development")
+DATABASE_ENGINE = os.environ.get("DJANGO_DATABASE_ENGINE", "sqlite")
+
+if DATABASE_ENGINE == "postgresql":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("POSTGRES_DB", "shopping_list"),
+            "USER": os.environ.get("POSTGRES_USER", "postgres"),
+            "PASSWORD": os.environ.get("POSTGRES_PASSWORD", ""),
+            "HOST": os.environ.get("POSTGRES_HOST", "localhost"),
+            "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+        }
+    }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("DJANGO_DATABASE_NAME", BASE_DIR / "db.sqlite3"),
+        }
+    }
+
+if DATABASE_PROFILE == "production" and DATABASE_ENGINE == "postgresql":
+    # A pool replaces CONN_MAX_AGE, which has to stay 0.
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": int(os.environ.get("DJANGO_DATABASE_POOL_MIN_SIZE", 2)),
+            "max_size": int(os.environ.get("DJANGO_DATABASE_POOL_MAX_SIZE", 10)),
+            "timeout": 10,
+        }
+    }
+elif DATABASE_PROFILE == "production":
+    DATABASES["default"].update(
+        {
+            "CONN_MAX_AGE": 600,
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {
+                # Writers take the lock when their transaction begins, so they
+                # wait for the busy timeout instead of failing on upgrade.
+                "transaction_mode": "IMMEDIATE",
+                "timeout": 20,
+                "init_command": (
+                    "PRAGMA journal_mode=WAL;"
+                    "PRAGMA synchronous=NORMAL;"
+                    "PRAGMA mmap_size=134217728;"
+                    "PRAGMA journal_size_limit=27103364;"
+                    "PRAGMA cache_size=2000;"
+                ),
+            },
+        }
+    )
+
+# DJANGO_DATABASE_REPLICA adds a read replica of the default database: its
+# host for PostgreSQL, or its file for SQLite (a copy of db.sqlite3 is enough
+# to try the routing locally).
+if os.environ.get("DJANGO_DATABASE_REPLICA"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "HOST" if DATABASE_ENGINE == "postgresql" else "NAME": os.environ[
+            "DJANGO_DATABASE_REPLICA"
+        ],
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["shopping_list.routers.PrimaryReplicaRouter"]
+
+# Replicas the shopping_list reads are spread over, and the seconds a user
+# keeps reading from the primary after a write
+SHOPPING_LIST_DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+SHOPPING_LIST_PRIMARY_STICKY_SECONDS = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
     }
 }
 
@@ -130,7 +211,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "shopping_list.api.authentication.CachedTokenAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
@@ -139,9 +220,7 @@ REST_FRAMEWORK = {
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 3,
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.AnonRateThrottle",
-        "shopping_list.api.throttling.MinuteRateThrottle",
-        "shopping_list.api.throttling.DailyRateThrottle",
+        "shopping_list.api.throttling.DefaultRateThrottle",
     ],
     "DEFAULT_THROTTLE_RATES": {
         "anon": "10/hour",
@@ -166,3 +245,61 @@ SPECTACULAR_SETTINGS = {
 CORS_ALLOW_ALL_ORIGINS = DEBUG
 
 AUTH_USER_MODEL = "shopping_list.User"
+
+# Seconds an API token stays cached with its user in the default cache, 0
+# disables it. Deleting a token or deactivating its user only invalidates the
+# cache the changing process sees, so this needs a cache shared by every
+# process, which the shopping_list.E002 check enforces
+SHOPPING_LIST_TOKEN_CACHE_TIMEOUT = 0
+
+# Seconds a (user, shopping list) membership verdict stays in the default cache,
+# 0 disables it. A change only invalidates the verdicts in the cache the
+# changing process sees, so this needs a cache shared by every process, e.g.
+# Redis or Memcached, which the shopping_list.E001 check enforces
+SHOPPING_LIST_MEMBERSHIP_CACHE_TIMEOUT = 0
+
+# Dotted path to the shopping item search backend, None picks SQLite FTS5 when
+# its table exists and the trigram index otherwise
+SHOPPING_ITEM_SEARCH_BACKEND = None
+SHOPPING_ITEM_SEARCH_MAX_RESULTS = 200
+
+# Cache alias holding cached GET responses, and the number of seconds a
+# response stays cached (0 disables response caching)
+SHOPPING_LIST_RESPONSE_CACHE = "default"
+SHOPPING_LIST_RESPONSE_CACHE_TIMEOUT = 300
+
+# Broker fanning out shopping list change events to /api/changes/ streams, and
+# the seconds between keep-alive comments on an idle stream
+SHOPPING_LIST_EVENT_BROKER = "shopping_list.events.InProcessEventBroker"
+SHOPPING_LIST_EVENTS_HEARTBEAT = 15
+
+# Most change log entries (or snapshot items) read by one /api/sync/ call, and
+# the days they are kept by `manage.py prune_sync_changes`
+SHOPPING_LIST_SYNC_MAX_CHANGES = 500
+SHOPPING_LIST_SYNC_RETENTION_DAYS = 30
+# Seconds after which a gap in the change ids is taken for a rolled back
+# transaction rather than one yet to commit; longer than any transaction
+SHOPPING_LIST_SYNC_SETTLE_SECONDS = 30
+
+# Serve the list, detail, item and search endpoints with their async views,
+# which only pay off under an ASGI server (core.asgi)
+SHOPPING_LIST_ASYNC_VIEWS = False
+
+# Serialize the GET responses of the list, detail, item and search endpoints
+# with precompiled field plans instead of the DRF serializer fields
+SHOPPING_LIST_COMPILED_SERIALIZERS = True
+
+# Rows read and written per chunk by `?stream=1` item and search responses
+# and by /api/export/
+SHOPPING_LIST_STREAM_CHUNK_SIZE = 2000
+
+# Time requests, their SQL queries and response rendering per view, reported
+# at /metrics (off removes the middleware). Per-request timings are also sent
+# to clients in a Server-Timing header when SHOPPING_LIST_SERVER_TIMING is set.
+# /metrics answers staff users, and requests with the bearer token
+# SHOPPING_LIST_METRICS_TOKEN.
+SHOPPING_LIST_INSTRUMENTATION = (
+    os.environ.get("SHOPPING_LIST_INSTRUMENTATION", "1" if DEBUG else "0") == "1"
+)
+SHOPPING_LIST_SERVER_TIMING = DEBUG
+SHOPPING_LIST_METRICS_TOKEN = os.environ.get("SHOPPING_LIST_METRICS_TOKEN")
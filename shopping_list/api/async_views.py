@@ -0,0 +1,202 @@
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from rest_framework import status
+from rest_framework.response import Response
+
+from shopping_list.api import views
+from shopping_list.api.caching import CachedResponseMixin, response_cache
+from shopping_list.api.streaming import StreamingListMixin
+
+import inspect
+
+
+async def _check(permission, name, *args):
+    # Permissions without an async variant are called as they are, so they
+    # must not query the database (like IsAuthenticated).
+    async_check = getattr(permission, f"a{name}", None)
+    if async_check is not None:
+        return await async_check(*args)
+    return getattr(permission, name)(*args)
+
+
+class AsyncAPIViewMixin:
+    """
+    Native async dispatch for DRF views, which only dispatch synchronously.
+
+    Reads go through the async ORM and the `a`-prefixed permission checks;
+    authentication, throttling, pagination and writes, which DRF only offers
+    synchronously, run in one sync_to_async call each.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.ainitial(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(
+                    self, request.method.lower(), self.http_method_not_allowed
+                )
+            else:
+                handler = self.http_method_not_allowed
+
+            if inspect.iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def ainitial(self, request, *args, **kwargs):
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+
+        neg = self.perform_content_negotiation(request)
+        request.accepted_renderer, request.accepted_media_type = neg
+
+        version, scheme = self.determine_version(request, *args, **kwargs)
+        request.version, request.versioning_scheme = version, scheme
+
+        await sync_to_async(self.perform_authentication)(request)
+        await self.acheck_permissions(request)
+        await sync_to_async(self.check_throttles)(request)
+
+    async def acheck_permissions(self, request):
+        for permission in self.get_permissions():
+            if not await _check(permission, "has_permission", request, self):
+                self.permission_denied(
+                    request,
+                    message=getattr(permission, "message", None),
+                    code=getattr(permission, "code", None),
+                )
+
+    async def acheck_object_permissions(self, request, obj):
+        for permission in self.get_permissions():
+            if not await _check(
+                permission, "has_object_permission", request, self, obj
+            ):
+                self.permission_denied(
+                    request,
+                    message=getattr(permission, "message", None),
+                    code=getattr(permission, "code", None),
+                )
+
+    async def aget_object(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+
+        try:
+            obj = await queryset.aget(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        except (queryset.model.DoesNotExist, TypeError, ValueError, ValidationError):
+            raise Http404
+
+        await self.acheck_object_permissions(self.request, obj)
+        return obj
+
+    def filter_and_paginate_queryset(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        return queryset, self.paginate_queryset(queryset)
+
+    async def alist(self, request, *args, **kwargs):
+        if isinstance(self, StreamingListMixin) and self.wants_stream():
+            queryset = await sync_to_async(self.get_stream_queryset)()
+            return self.astream_list(queryset)
+
+        # Search filters query their index, and paginators count and slice
+        # the queryset synchronously.
+        queryset, page = await sync_to_async(self.filter_and_paginate_queryset)()
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(
+            [instance async for instance in queryset], many=True
+        )
+        return Response(serializer.data)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        return Response(self.get_serializer(instance).data)
+
+
+class AsyncCachedResponseMixin(CachedResponseMixin):
+    async def get(self, request, *args, **kwargs):
+        fingerprint = await sync_to_async(self.get_validators)()
+        if fingerprint is None:
+            return await self.aget_uncached(request, *args, **kwargs)
+
+        etag = self.get_etag(request, fingerprint)
+        if self.is_not_modified(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = await self.aget_cached_response(request, etag, *args, **kwargs)
+        return self.add_validator_headers(response, etag)
+
+    async def aget_uncached(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+    async def aget_cached_response(self, request, etag, *args, **kwargs):
+        timeout = self.get_cache_timeout()
+        if not timeout:
+            return await self.aget_uncached(request, *args, **kwargs)
+
+        cache = response_cache()
+        data = await cache.aget(self.get_cache_key(etag))
+        if data is not None:
+            return Response(data)
+
+        response = await self.aget_uncached(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK and not response.streaming:
+            await cache.aset(self.get_cache_key(etag), response.data, timeout)
+        return response
+
+
+class ListAddShoppingList(
+    AsyncCachedResponseMixin, AsyncAPIViewMixin, views.ListAddShoppingList
+):
+    async def aget_uncached(self, request, *args, **kwargs):
+        return await self.alist(request, *args, **kwargs)
+
+    async def post(self, request, *args, **kwargs):
+        return await sync_to_async(super().post)(request, *args, **kwargs)
+
+
+class ShoppingListDetail(
+    AsyncCachedResponseMixin, AsyncAPIViewMixin, views.ShoppingListDetail
+):
+    async def aget_uncached(self, request, *args, **kwargs):
+        return await self.aretrieve(request, *args, **kwargs)
+
+    async def put(self, request, *args, **kwargs):
+        return await sync_to_async(super().put)(request, *args, **kwargs)
+
+    async def patch(self, request, *args, **kwargs):
+        return await sync_to_async(super().patch)(request, *args, **kwargs)
+
+    async def delete(self, request, *args, **kwargs):
+        return await sync_to_async(super().delete)(request, *args, **kwargs)
+
+
+class ListAddShoppingItem(
+    AsyncCachedResponseMixin, AsyncAPIViewMixin, views.ListAddShoppingItem
+):
+    async def aget_uncached(self, request, *args, **kwargs):
+        return await self.alist(request, *args, **kwargs)
+
+    async def post(self, request, *args, **kwargs):
+        return await sync_to_async(super().post)(request, *args, **kwargs)
+
+
+class SearchShoppingItems(AsyncAPIViewMixin, views.SearchShoppingItems):
+    async def get(self, request, *args, **kwargs):
+        return await self.alist(request, *args, **kwargs)
@@ -0,0 +1,104 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+import hashlib
+
+
+def _cache_key(key):
+    return f"shopping-list-token:{hashlib.sha256(key.encode()).hexdigest()}"
+
+
+def _cache_timeout():
+    return getattr(settings, "SHOPPING_LIST_TOKEN_CACHE_TIMEOUT", 0)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that keeps each token's user in the default cache for
+    SHOPPING_LIST_TOKEN_CACHE_TIMEOUT seconds, instead of joining them on
+    every request.
+
+    Neither the token key nor the password hash is cached: the user comes
+    back with its password deferred, and the key is the one presented.
+    Deleting a token or saving its user drops the cached entry. Changes made
+    with QuerySet.update() send no signals, and show once the entry expires.
+    """
+
+    def get_token(self, key):
+        timeout = _cache_timeout()
+        cached = cache.get(_cache_key(key)) if timeout else None
+        if cached is not None:
+            return self.restore_token(key, cached)
+
+        token = self.get_model().objects.select_related("user").get(key=key)
+        if timeout:
+            cache.set(_cache_key(key), self.cached_token(token), timeout)
+        return token
+
+    def cached_token(self, token):
+        user = token.user
+        return {
+            "created": token.created,
+            "db": user._state.db,
+            "user": {
+                field.attname: getattr(user, field.attname)
+                for field in type(user)._meta.concrete_fields
+                if field.attname != "password"
+            },
+        }
+
+    def restore_token(self, key, cached):
+        user_model = get_user_model()
+        fields = cached["user"]
+        user = user_model.from_db(cached["db"], list(fields), list(fields.values()))
+        token = self.get_model()(key=key, user=user, created=cached["created"])
+        token._state.adding = False
+        token._state.db = cached["db"]
+        return token
+
+    def authenticate_credentials(self, key):
+        try:
+            token = self.get_token(key)
+        except self.get_model().DoesNotExist:
+            raise exceptions.AuthenticationFailed(_("Invalid token."))
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+
+        return (token.user, token)
+
+
+def invalidate_tokens(keys):
+    if _cache_timeout():
+        cache.delete_many([_cache_key(key) for key in keys])
+
+
+def invalidate_user_tokens(user_id):
+    if _cache_timeout():
+        invalidate_tokens(
+            Token.objects.filter(user_id=user_id).values_list("key", flat=True)
+        )
+
+
+# Saving other fields, e.g. last_login on every login, keeps the cached tokens.
+TOKEN_USER_FIELDS = {"is_active", "password", "username", "is_staff", "is_superuser"}
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_tokens([instance.key])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_saved_user_tokens(sender, instance, created, update_fields, **kwargs):
+    # The cached tokens carry a copy of the user, e.g. of its is_active.
+    if created or (update_fields is not None and not update_fields & TOKEN_USER_FIELDS):
+        return
+    invalidate_user_tokens(instance.pk)
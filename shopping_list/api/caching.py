@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import patch_vary_headers
+from rest_framework import status
+from rest_framework.response import Response
+
+import hashlib
+
+
+def response_cache():
+    return caches[getattr(settings, "SHOPPING_LIST_RESPONSE_CACHE", "default")]
+
+
+class CachedResponseMixin:
+    """
+    Conditional and cached GET for payloads built from shopping lists.
+
+    `get_validators()` returns a fingerprint of the lists the response is built
+    from (their `last_interaction`). A matching If-None-Match gets a 304
+    before any serializer or paginator runs; otherwise the payload is served
+    from the cache under the resulting ETag.
+
+    There is no Last-Modified: its whole seconds would not tell apart two
+    changes made within the same second.
+    """
+
+    cache_per_user = True
+
+    def get_validators(self):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        fingerprint = self.get_validators()
+        if fingerprint is None:
+            return super().get(request, *args, **kwargs)
+
+        etag = self.get_etag(request, fingerprint)
+        if self.is_not_modified(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = self.get_cached_response(request, etag, *args, **kwargs)
+        return self.add_validator_headers(response, etag)
+
+    def add_validator_headers(self, response, etag):
+        if response.status_code not in (
+            status.HTTP_200_OK,
+            status.HTTP_304_NOT_MODIFIED,
+        ):
+            return response
+        response["ETag"] = etag
+        patch_vary_headers(response, ["Authorization", "Cookie"])
+        return response
+
+    def get_etag(self, request, fingerprint):
+        user_id = request.user.pk if self.cache_per_user else None
+        fingerprint = repr((user_id, request.get_full_path(), fingerprint))
+        return '"{}"'.format(hashlib.sha1(fingerprint.encode()).hexdigest())
+
+    def is_not_modified(self, request, etag):
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match is None:
+            return False
+        etags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in etags or etag in etags
+
+    def get_cache_timeout(self):
+        return getattr(settings, "SHOPPING_LIST_RESPONSE_CACHE_TIMEOUT", 300)
+
+    def get_cache_key(self, etag):
+        return f"shopping-list-response:{etag}"
+
+    def get_cached_response(self, request, etag, *args, **kwargs):
+        timeout = self.get_cache_timeout()
+        if not timeout:
+            return super().get(request, *args, **kwargs)
+
+        cache = response_cache()
+        data = cache.get(self.get_cache_key(etag))
+        if data is not None:
+            return Response(data)
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK and not response.streaming:
+            cache.set(self.get_cache_key(etag), response.data, timeout)
+        return response
@@ -0,0 +1,85 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from shopping_list.events import get_event_broker
+from shopping_list.membership import shopping_list_ids
+
+import json
+
+
+def _authenticate(request):
+    return Request(
+        request,
+        authenticators=[
+            authentication()
+            for authentication in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+        ],
+    ).user
+
+
+def is_visible(event, user_id, visible_shopping_list_ids):
+    """
+    Tell whether a member of `visible_shopping_list_ids` should get `event`,
+    keeping the set up to date with the user's membership changes.
+    """
+    shopping_list_id = event["shopping_list"]
+    affects_user = user_id in event.get("members", ())
+
+    if event["type"] == "members.added" and affects_user:
+        visible_shopping_list_ids.add(shopping_list_id)
+    visible = shopping_list_id in visible_shopping_list_ids
+    if event["type"] == "list.deleted" or (
+        event["type"] == "members.removed" and affects_user
+    ):
+        visible_shopping_list_ids.discard(shopping_list_id)
+
+    return visible
+
+
+async def stream_events(user):
+    visible_shopping_list_ids = {
+        str(shopping_list_id) async for shopping_list_id in shopping_list_ids(user)
+    }
+    heartbeat = getattr(settings, "SHOPPING_LIST_EVENTS_HEARTBEAT", 15)
+
+    yield "retry: 3000\n\n"
+    async for event in get_event_broker().subscribe(heartbeat=heartbeat):
+        if event is None:
+            yield ": keep-alive\n\n"
+        elif is_visible(event, user.pk, visible_shopping_list_ids):
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+@require_GET
+async def change_feed(request):
+    """
+    Server-Sent Events stream of the item, list and member changes of the
+    shopping lists the user belongs to. Needs an ASGI server (core.asgi), and
+    answers 501 under WSGI.
+    """
+    try:
+        user = await sync_to_async(_authenticate)(request)
+    except exceptions.AuthenticationFailed as exc:
+        return JsonResponse({"detail": exc.detail}, status=exc.status_code)
+    if not user.is_authenticated:
+        exc = exceptions.NotAuthenticated()
+        return JsonResponse({"detail": exc.detail}, status=exc.status_code)
+    # A WSGI server would read the endless stream into memory, forever.
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {"detail": "The change feed is only served over ASGI."},
+            status=status.HTTP_501_NOT_IMPLEMENTED,
+        )
+
+    response = StreamingHttpResponse(
+        stream_events(user), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,150 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Manager
+from rest_framework import serializers
+
+from functools import cache
+from operator import attrgetter
+
+
+def _converter(field):
+    # The same values as the fields' to_representation(), without the call.
+    if isinstance(field, serializers.UUIDField) and field.uuid_format == "hex_verbose":
+        return str
+    if type(field) is serializers.CharField:
+        return str
+    if type(field) is serializers.BooleanField:
+        return bool
+    if type(field) is serializers.IntegerField:
+        return int
+    return field.to_representation
+
+
+class CompiledSerializer:
+    """
+    Read-only plan of a serializer's fields, turning model instances or
+    `.values()` rows into the same data as `serializer_class(...).data`.
+
+    Only plain fields, SerializerMethodFields and nested serializers are
+    supported. A serializer whose fields all read one column is `flat`, and
+    can then be fed rows of `queryset.values(*plan.value_fields)`.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self.plan = []
+        self.value_fields = []
+
+        for name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+
+            if isinstance(field, serializers.SerializerMethodField):
+                self.plan.append((name, "method", field.method_name, None))
+            elif isinstance(field, serializers.ListSerializer):
+                child = compile_serializer(type(field.child))
+                self.plan.append((name, "many", attrgetter(field.source), child))
+            elif isinstance(field, serializers.BaseSerializer):
+                child = compile_serializer(type(field))
+                self.plan.append((name, "one", attrgetter(field.source), child))
+            elif (
+                isinstance(
+                    field, (serializers.RelatedField, serializers.ManyRelatedField)
+                )
+                or field.source == "*"
+            ):
+                raise ImproperlyConfigured(
+                    f"{serializer_class.__name__}.{name} cannot be compiled"
+                )
+            else:
+                self.plan.append(
+                    (name, "field", attrgetter(field.source), _converter(field))
+                )
+                self.value_fields.append(field.source.replace(".", "__"))
+
+        self.flat = len(self.value_fields) == len(self.plan)
+
+    def values(self, queryset):
+        # The ordering columns go along for keyset pagination cursors.
+        extra_fields = [
+            field.lstrip("-")
+            for field in queryset.query.order_by
+            if isinstance(field, str) and field.lstrip("-") not in self.value_fields
+        ]
+        return queryset.values(*self.value_fields, *extra_fields)
+
+    def to_representation(self, obj, serializer=None):
+        if isinstance(obj, dict):
+            data = {}
+            for (name, _, _, convert), key in zip(self.plan, self.value_fields):
+                value = obj[key]
+                data[name] = None if value is None else convert(value)
+            return data
+
+        data = {}
+        for name, kind, get, convert in self.plan:
+            if kind == "method":
+                data[name] = getattr(serializer, get)(obj)
+                continue
+
+            value = get(obj)
+            if value is None:
+                data[name] = None
+            elif kind == "field":
+                data[name] = convert(value)
+            elif kind == "one":
+                data[name] = convert.to_representation(value)
+            else:
+                if isinstance(value, Manager):
+                    value = value.all()
+                data[name] = [convert.to_representation(child) for child in value]
+        return data
+
+    def data(self, instance, many=False, context=None):
+        serializer = self.serializer_class(context=context or {})
+        if many:
+            return [self.to_representation(obj, serializer) for obj in instance]
+        return self.to_representation(instance, serializer)
+
+
+@cache
+def compile_serializer(serializer_class):
+    return CompiledSerializer(serializer_class)
+
+
+class CompiledData:
+    def __init__(self, plan, instance, many, context):
+        self.data = plan.data(instance, many=many, context=context)
+
+
+class CompiledReadMixin:
+    """
+    Serialize the GET responses of a generic view with the compiled plan of
+    its serializer class. Writes, and the schema, still use the serializer.
+    Turned off by SHOPPING_LIST_COMPILED_SERIALIZERS.
+    """
+
+    def get_compiled_serializer(self):
+        request = getattr(self, "request", None)
+        if request is None or request.method not in ("GET", "HEAD"):
+            return None
+        if not getattr(settings, "SHOPPING_LIST_COMPILED_SERIALIZERS", True):
+            return None
+        return compile_serializer(self.get_serializer_class())
+
+    def get_read_queryset(self, queryset):
+        plan = self.get_compiled_serializer()
+        if plan is not None and plan.flat:
+            return plan.values(queryset)
+        return queryset
+
+    def paginate_queryset(self, queryset):
+        return super().paginate_queryset(self.get_read_queryset(queryset))
+
+    def get_serializer(self, *args, **kwargs):
+        plan = self.get_compiled_serializer()
+        if plan is None or len(args) != 1 or set(kwargs) - {"many"}:
+            return super().get_serializer(*args, **kwargs)
+        return CompiledData(
+            plan, args[0], kwargs.get("many", False), self.get_serializer_context()
+        )
@@ -0,0 +1,89 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework import filters
+
+from shopping_list.membership import shopping_list_ids
+from shopping_list.search import get_search_backend
+
+
+class RankedResults:
+    """
+    The rows of `queryset` in the order of `ranked_ids`, standing in for the
+    queryset in pagination and streaming. Each slice is read with an
+    `id__in` lookup and put in rank order in Python.
+    """
+
+    def __init__(self, queryset, ranked_ids):
+        self.queryset = queryset
+        self.ranked_ids = ranked_ids
+        self.query = queryset.query
+
+    @property
+    def model(self):
+        return self.queryset.model
+
+    def values(self, *fields):
+        return RankedResults(self.queryset.values(*fields), self.ranked_ids)
+
+    def count(self):
+        return len(self.ranked_ids)
+
+    def __len__(self):
+        return len(self.ranked_ids)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index : index + 1][0]
+
+        ids = self.ranked_ids[index]
+        rank = {item_id: position for position, item_id in enumerate(ids)}
+        rows = list(self.queryset.filter(id__in=ids))
+        return sorted(
+            rows, key=lambda row: rank[row["id"] if isinstance(row, dict) else row.id]
+        )
+
+    def iterator(self, chunk_size=2000):
+        for start in range(0, len(self.ranked_ids), chunk_size):
+            yield from self[start : start + chunk_size]
+
+    async def aiterator(self, chunk_size=2000):
+        for start in range(0, len(self.ranked_ids), chunk_size):
+            for row in await sync_to_async(self.__getitem__)(
+                slice(start, start + chunk_size)
+            ):
+                yield row
+
+    def __iter__(self):
+        return self.iterator()
+
+    def __aiter__(self):
+        return self.aiterator()
+
+
+class ShoppingItemSearchFilter(filters.SearchFilter):
+    """
+    Query the configured search backend instead of `name ICONTAINS`, and order
+    the matching items by rank.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, "")
+        if not query.strip():
+            return queryset
+
+        ranked_ids = get_search_backend().search(
+            query,
+            list(shopping_list_ids(request.user)),
+            getattr(settings, "SHOPPING_ITEM_SEARCH_MAX_RESULTS", 200),
+        )
+        if not ranked_ids:
+            return queryset.none()
+
+        # Only the ids the queryset itself lets through are kept.
+        visible_ids = set(
+            queryset.filter(id__in=ranked_ids).values_list("id", flat=True)
+        )
+        return RankedResults(
+            queryset,
+            [item_id for item_id in ranked_ids if item_id in visible_ids],
+        )
@@ -1,7 +1,228 @@
-from rest_framework.pagination import PageNumberPagination
+from base64 import b64decode, b64encode
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    BasePagination,
+    CursorPagination,
+    PageNumberPagination,
+)
+from rest_framework.utils.urls import replace_query_param
+
+from shopping_list.api.filters import RankedResults
+
+import binascii
+import json
 
 
 class LargerResultsSetPagination(PageNumberPagination):
     page_size = 5
     page_size_query_param = "page_size"
     max_page_size = 10
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset pagination over whatever ordering the queryset already has.
+
+    The cursor stores the ordering values of the first or last row of a page,
+    and the next page is read with a `WHERE (a, b, id) > (...)` style filter.
+    The `id` tie-breaker keeps the order stable, so no COUNT or OFFSET is run.
+    """
+
+    ordering = None
+    tie_breaker = "id"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        if isinstance(queryset, RankedResults):
+            return self.paginate_ranked_results(queryset, request)
+        self.ranks = None
+        self.ordering = self.get_keyset_ordering(queryset)
+
+        position, self.reverse = self.decode_cursor(request)
+        ordering = self.ordering
+        if self.reverse:
+            ordering = [self._flip(field) for field in ordering]
+
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(position, ordering))
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[: self.page_size]
+
+        if self.reverse:
+            self.page.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        return self.page
+
+    def paginate_ranked_results(self, results, request):
+        # Search results have no column to order by: cursors hold a rank.
+        self.ordering = ["rank"]
+        position, self.reverse = self.decode_cursor(request)
+        if position is not None and not isinstance(position[0], int):
+            raise NotFound(self.invalid_cursor_message)
+
+        if position is None:
+            start, end = 0, self.page_size
+        elif self.reverse:
+            start, end = max(position[0] - self.page_size, 0), position[0]
+        else:
+            start, end = position[0] + 1, position[0] + 1 + self.page_size
+        end = min(end, len(results))
+
+        self.page = results[start:end]
+        self.ranks = (start, end - 1)
+        self.has_previous = start > 0
+        self.has_next = end < len(results)
+        return self.page
+
+    def get_keyset_ordering(self, queryset):
+        ordering = [
+            field for field in queryset.query.order_by if isinstance(field, str)
+        ]
+        if len(ordering) != len(queryset.query.order_by):
+            ordering = []
+
+        if self.tie_breaker not in [field.lstrip("-") for field in ordering]:
+            ordering.append(self.tie_breaker)
+
+        return ordering
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if self.ranks is not None:
+            return self.encode_cursor([self.ranks[1]], reverse=False)
+        return self._link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.ranks is not None:
+            return self.encode_cursor([self.ranks[0]], reverse=True)
+        return self._link(self.page[0], reverse=True)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+
+        try:
+            cursor = json.loads(b64decode(encoded.encode("ascii")).decode("utf-8"))
+            position, reverse = cursor["p"], bool(cursor["r"])
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        return position, reverse
+
+    def encode_cursor(self, position, reverse):
+        cursor = json.dumps({"p": position, "r": reverse}, default=str)
+        encoded = b64encode(cursor.encode("utf-8")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def _link(self, row, reverse):
+        position = [self._value(row, field.lstrip("-")) for field in self.ordering]
+        return self.encode_cursor(position, reverse)
+
+    @staticmethod
+    def _value(row, field):
+        if isinstance(row, dict):
+            return row[field]
+        return getattr(row, field)
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    @staticmethod
+    def _after(position, ordering):
+        condition = Q()
+        equal_to = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition |= Q(**equal_to, **{f"{name}__{lookup}": value})
+            equal_to[name] = value
+        return condition
+
+
+class LargerResultsSetKeysetPagination(KeysetPagination):
+    page_size = 5
+    page_size_query_param = "page_size"
+    max_page_size = 10
+
+
+class PageNumberOrKeysetPagination(BasePagination):
+    """
+    Page number pagination unless the client asks for `?pagination=cursor`
+    or follows a `cursor` link, so existing clients keep their page numbers.
+    """
+
+    page_number_pagination_class = PageNumberPagination
+    keyset_pagination_class = KeysetPagination
+    pagination_query_param = "pagination"
+
+    def __init__(self):
+        self.page_number_pagination = self.page_number_pagination_class()
+        self.keyset_pagination = self.keyset_pagination_class()
+        self.pagination = self.page_number_pagination
+
+    def use_keyset(self, request):
+        return (
+            request.query_params.get(self.pagination_query_param) == "cursor"
+            or self.keyset_pagination.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_keyset(request):
+            self.pagination = self.keyset_pagination
+        return self.pagination.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.pagination.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_number_pagination.get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        parameters = self.page_number_pagination.get_schema_operation_parameters(view)
+        names = {parameter["name"] for parameter in parameters}
+        parameters.append(
+            {
+                "name": self.pagination_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Set to `cursor` to use keyset pagination.",
+                "schema": {"type": "string", "enum": ["cursor"]},
+            }
+        )
+        parameters += [
+            parameter
+            for parameter in self.keyset_pagination.get_schema_operation_parameters(
+                view
+            )
+            if parameter["name"] not in names
+        ]
+        return parameters
+
+    def to_html(self):
+        return self.pagination.to_html()
+
+
+class LargerResultsSetOrKeysetPagination(PageNumberOrKeysetPagination):
+    page_number_pagination_class = LargerResultsSetPagination
+    keyset_pagination_class = LargerResultsSetKeysetPagination
@@ -1,6 +1,9 @@
 from rest_framework import permissions
 
-from shopping_list.models import ShoppingList
+from shopping_list.membership import ais_member, is_member
+
+
+# The `a`-prefixed methods are used by the async views, see AsyncAPIViewMixin.
 
 
 class ShoppingListMembersOnly(permissions.BasePermission):
@@ -8,20 +11,27 @@ class ShoppingListMembersOnly(permissions.BasePermission):
         if request.user.is_superuser:
             return True
 
-        if request.user in obj.members.all():
+        return is_member(request.user, obj.pk, request)
+
+    async def ahas_object_permission(self, request, view, obj):
+        if request.user.is_superuser:
             return True
 
-        return False
+        return await ais_member(request.user, obj.pk, request)
 
 
 class ShoppingItemShoppingListMembersOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.user.is_superuser:
             return True
-        if request.user in obj.shopping_list.members.all():
+
+        return is_member(request.user, obj.shopping_list_id, request)
+
+    async def ahas_object_permission(self, request, view, obj):
+        if request.user.is_superuser:
             return True
 
-        return False
+        return await ais_member(request.user, obj.shopping_list_id, request)
 
 
 class AllShoppingItemsShoppingListMembersOnly(permissions.BasePermission):
@@ -29,8 +39,10 @@ class AllShoppingItemsShoppingListMembersOnly(permissions.BasePermission):
         if request.user.is_superuser:
             return True
 
-        current_shopping_list = ShoppingList.objects.get(pk=view.kwargs.get("pk"))
-        if request.user in current_shopping_list.members.all():
+        return is_member(request.user, view.kwargs.get("pk"), request)
+
+    async def ahas_permission(self, request, view):
+        if request.user.is_superuser:
             return True
 
-        return False
+        return await ais_member(request.user, view.kwargs.get("pk"), request)
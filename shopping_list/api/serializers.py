@@ -1,12 +1,29 @@
 from typing import List, TypedDict
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Q
 from rest_framework import serializers
 
-from shopping_list.models import ShoppingItem, ShoppingList
+from shopping_list.events import publish_event, shopping_item_event_data
+from shopping_list.interactions import (
+    coalesce_touches,
+    item_count_changes,
+    item_state,
+    touch_shopping_lists,
+)
+from shopping_list.search import get_search_backend
+from shopping_list.sync import SyncToken, record_changes
+from shopping_list.models import (
+    ShoppingItem,
+    ShoppingList,
+    ShoppingListChange,
+)
 
 
 User = get_user_model()
 
+DUPLICATE_ITEM_MESSAGE = "There is already this item on the list"
+
 
 class ShoppingItemSerializer(serializers.ModelSerializer):
     class Meta:
@@ -18,12 +35,142 @@ class ShoppingItemSerializer(serializers.ModelSerializer):
             "kwargs"
         ]["pk"]
 
-        if ShoppingList.objects.get(
-            id=validated_data["shopping_list_id"]
-        ).shopping_items.filter(name=validated_data["name"], purchased=False):
-            raise serializers.ValidationError("There is already this item on the list")
+        # Duplicate unpurchased names are rejected by the
+        # unique_unpurchased_item_name constraint.
+        try:
+            with transaction.atomic():
+                return super(ShoppingItemSerializer, self).create(validated_data)
+        except IntegrityError:
+            raise serializers.ValidationError(DUPLICATE_ITEM_MESSAGE)
+
+    def update(self, instance, validated_data):
+        try:
+            with transaction.atomic():
+                return super(ShoppingItemSerializer, self).update(
+                    instance, validated_data
+                )
+        except IntegrityError:
+            raise serializers.ValidationError(DUPLICATE_ITEM_MESSAGE)
+
+
+class ShoppingItemBulkUpdateSerializer(serializers.Serializer):
+    id = serializers.UUIDField()
+    name = serializers.CharField(max_length=200, required=False)
+    purchased = serializers.BooleanField(required=False)
+
+
+class BulkShoppingItemSerializer(serializers.Serializer):
+    def get_fields(self):
+        # Declared here because the field names clash with Serializer methods.
+        return {
+            "create": ShoppingItemSerializer(many=True, required=False),
+            "update": ShoppingItemBulkUpdateSerializer(many=True, required=False),
+            "delete": serializers.ListField(
+                child=serializers.UUIDField(), required=False
+            ),
+        }
+
+    def validate(self, attrs):
+        update_ids = [item["id"] for item in attrs.get("update", [])]
+        delete_ids = attrs.get("delete", [])
+
+        if len(set(update_ids)) != len(update_ids):
+            raise serializers.ValidationError("An item can only be updated once")
+        if set(update_ids) & set(delete_ids):
+            raise serializers.ValidationError(
+                "An item can not be updated and deleted at once"
+            )
+
+        return attrs
+
+    def create(self, validated_data):
+        shopping_list_id = self.context["request"].parser_context["kwargs"]["pk"]
+        items_to_create = validated_data.get("create", [])
+        updates = {item.pop("id"): item for item in validated_data.get("update", [])}
+        delete_ids = validated_data.get("delete", [])
+
+        try:
+            with transaction.atomic(), coalesce_touches():
+                result = self._apply(
+                    shopping_list_id, items_to_create, updates, delete_ids
+                )
+        except IntegrityError:
+            raise serializers.ValidationError(DUPLICATE_ITEM_MESSAGE)
+
+        return result
+
+    def _apply(self, shopping_list_id, items_to_create, updates, delete_ids):
+        # Locked, so that a concurrent request changing the same items waits
+        # and then counts only what is left to change.
+        shopping_items = ShoppingItem.objects.filter(
+            shopping_list_id=shopping_list_id
+        ).select_for_update()
+
+        deleted_ids = list(
+            shopping_items.filter(id__in=delete_ids).values_list("id", flat=True)
+        )
+        if len(deleted_ids) != len(set(delete_ids)):
+            raise serializers.ValidationError("Some items are not on the list")
+        shopping_items.filter(id__in=deleted_ids).delete()
 
-        return super(ShoppingItemSerializer, self).create(validated_data)
+        updated_items = shopping_items.in_bulk(updates.keys())
+        if len(updated_items) != len(updates):
+            raise serializers.ValidationError("Some items are not on the list")
+        stored_states = {}
+        for item_id, changes in updates.items():
+            stored_states[item_id] = item_state(updated_items[item_id])
+            for field, value in changes.items():
+                setattr(updated_items[item_id], field, value)
+        update_fields = {field for changes in updates.values() for field in changes}
+        if update_fields:
+            ShoppingItem.objects.bulk_update(
+                updated_items.values(), sorted(update_fields)
+            )
+
+        created_items = ShoppingItem.objects.bulk_create(
+            [
+                ShoppingItem(shopping_list_id=shopping_list_id, **item)
+                for item in items_to_create
+            ]
+        )
+
+        search_backend = get_search_backend()
+        search_backend.index(updated_items.values())
+        search_backend.index(created_items, new=True)
+        touch_shopping_lists(
+            shopping_list_id,
+            counts=item_count_changes(
+                *(
+                    (stored_states[item_id], item_state(shopping_item))
+                    for item_id, shopping_item in updated_items.items()
+                ),
+                *((None, item_state(shopping_item)) for shopping_item in created_items),
+            ),
+        )
+
+        # bulk_create and bulk_update send no post_save signal.
+        record_changes(
+            ShoppingListChange.SHOPPING_ITEM,
+            shopping_list_id,
+            [shopping_item.id for shopping_item in created_items]
+            + list(updated_items.keys()),
+        )
+        for event_type, shopping_items in [
+            ("item.created", created_items),
+            ("item.updated", updated_items.values()),
+        ]:
+            for shopping_item in shopping_items:
+                publish_event(
+                    event_type,
+                    shopping_list_id,
+                    item=shopping_item_event_data(shopping_item),
+                )
+
+        return {
+            "create": created_items,
+            "update": list(updated_items.values()),
+            "delete": deleted_ids,
+        }
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -42,36 +189,207 @@ class ShoppingListSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = ShoppingList
-        fields = ("id", "name", "unpurchased_items", "members")
+        fields = (
+            "id",
+            "name",
+            "unpurchased_items",
+            "item_count",
+            "unpurchased_item_count",
+            "members",
+        )
 
     def get_unpurchased_items(self, obj) -> List[UnpurchasedItem]:
-        return [
-            {"name": shopping_item.name}
-            for shopping_item in obj.shopping_items.filter(purchased=False)[:3]
-        ]
+        return [{"name": name} for name in obj.unpurchased_items_preview]
+
+    def update(self, instance, validated_data):
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        # Only the given fields: a full save could overwrite the item
+        # summaries written by a concurrent item change.
+        instance.save(update_fields=[*validated_data, "last_interaction"])
+        return instance
 
 
-class AddMemberSerializer(serializers.ModelSerializer):
+class MemberIdsField(serializers.ListField):
+    child = serializers.IntegerField()
+
+    def to_representation(self, members):
+        return list(members.values_list("pk", flat=True))
+
+
+class MembershipSerializer(serializers.ModelSerializer):
+    """
+    Users given by id, username or email, all looked up with one query. The
+    response lists the ids of every member of the shopping list.
+    """
+
+    members = MemberIdsField(required=False)
+    usernames = serializers.ListField(
+        child=serializers.CharField(), required=False, write_only=True
+    )
+    emails = serializers.ListField(
+        child=serializers.EmailField(), required=False, write_only=True
+    )
+
     class Meta:
         model = ShoppingList
-        fields = ["members"]
+        fields = ["members", "usernames", "emails"]
+
+    def validate(self, attrs):
+        ids = set(attrs.get("members", []))
+        usernames = set(attrs.get("usernames", []))
+        emails = set(attrs.get("emails", []))
+        if not (ids or usernames or emails):
+            raise serializers.ValidationError(
+                "Give at least one of members, usernames or emails."
+            )
+
+        users = User.objects.filter(
+            Q(pk__in=ids) | Q(username__in=usernames) | Q(email__in=emails)
+        ).values_list("pk", "username", "email")
+        found_ids, found_usernames, found_emails = set(), set(), {}
+        for pk, username, email in users:
+            found_ids.add(pk)
+            found_usernames.add(username)
+            found_emails.setdefault(email, []).append(pk)
+
+        errors = {}
+        if missing := ids - found_ids:
+            errors["members"] = [
+                f'Invalid pk "{pk}" - object does not exist.' for pk in sorted(missing)
+            ]
+        if missing := usernames - found_usernames:
+            errors["usernames"] = [
+                f'No user with username "{username}".' for username in sorted(missing)
+            ]
+        email_errors = [
+            (
+                f'No user with email "{email}".'
+                if email not in found_emails
+                else f'More than one user with email "{email}".'
+            )
+            for email in sorted(emails)
+            if len(found_emails.get(email, ())) != 1
+        ]
+        if email_errors:
+            errors["emails"] = email_errors
+        if errors:
+            raise serializers.ValidationError(errors)
+
+        user_ids = ids | {
+            pk
+            for pk, username, email in users
+            if username in usernames or email in emails
+        }
+        return {"user_ids": user_ids}
 
     def update(self, instance, validated_data):
-        for member in validated_data["members"]:
-            instance.members.add(member)
-            instance.save()
+        user_ids = validated_data["user_ids"]
+        with transaction.atomic():
+            current_ids = set(
+                ShoppingList.members.through.objects.filter(
+                    shoppinglist_id=instance.pk, user_id__in=user_ids
+                ).values_list("user_id", flat=True)
+            )
+            if changed_ids := self.change_members(instance, user_ids, current_ids):
+                # Only the interaction: a full save could overwrite the item
+                # summaries written by a concurrent item change.
+                instance.save(update_fields=["last_interaction"])
 
         return instance
 
+    def change_members(self, instance, user_ids, current_ids):
+        raise NotImplementedError
+
+
+class AddMemberSerializer(MembershipSerializer):
+    def change_members(self, instance, user_ids, current_ids):
+        added_ids = user_ids - current_ids
+        if added_ids:
+            instance.members.add(*added_ids)
+        return added_ids
+
+
+class RemoveMemberSerializer(MembershipSerializer):
+    def change_members(self, instance, user_ids, current_ids):
+        # Only actual members, so that m2m_changed reports real removals.
+        if current_ids:
+            instance.members.remove(*current_ids)
+        return current_ids
+
 
-class RemoveMemberSerializer(serializers.ModelSerializer):
+class ExportQuerySerializer(serializers.Serializer):
+    export_format = serializers.ChoiceField(
+        choices=["ndjson", "csv"], default="ndjson", required=False
+    )
+
+
+class SyncQuerySerializer(serializers.Serializer):
+    sync_token = serializers.CharField(required=False)
+
+    def validate_sync_token(self, value):
+        try:
+            return SyncToken.parse(value)
+        except ValueError:
+            raise serializers.ValidationError("Not a valid sync token.")
+
+
+class SyncShoppingListSerializer(serializers.ModelSerializer):
     class Meta:
         model = ShoppingList
-        fields = ["members"]
+        fields = ("id", "name", "last_interaction")
 
-    def update(self, instance, validated_data):
-        for member in validated_data["members"]:
-            instance.members.remove(member)
-            instance.save()
 
-        return instance
+class SyncShoppingItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ShoppingItem
+        fields = ("id", "shopping_list", "name", "purchased")
+
+
+class SyncMemberSerializer(serializers.Serializer):
+    shopping_list = serializers.UUIDField()
+    user = serializers.IntegerField()
+
+
+class SyncShoppingListsSerializer(serializers.Serializer):
+    updated = SyncShoppingListSerializer(many=True)
+    deleted = serializers.ListField(child=serializers.UUIDField())
+
+
+class SyncShoppingItemsSerializer(serializers.Serializer):
+    updated = SyncShoppingItemSerializer(many=True)
+    deleted = serializers.ListField(child=serializers.UUIDField())
+
+
+class SyncMembersSerializer(serializers.Serializer):
+    added = SyncMemberSerializer(many=True)
+    removed = SyncMemberSerializer(many=True)
+
+
+class SyncSerializer(serializers.Serializer):
+    sync_token = serializers.CharField()
+    has_more = serializers.BooleanField()
+    shopping_lists = SyncShoppingListsSerializer()
+    shopping_items = SyncShoppingItemsSerializer()
+    members = SyncMembersSerializer()
+
+    def to_representation(self, changes):
+        members = {True: [], False: []}
+        for (shopping_list_id, user_id), added in sorted(changes.members.items()):
+            members[added].append({"shopping_list": shopping_list_id, "user": user_id})
+
+        return super().to_representation(
+            {
+                "sync_token": changes.sync_token,
+                "has_more": changes.has_more,
+                "shopping_lists": {
+                    "updated": changes.shopping_lists(),
+                    "deleted": sorted(map(str, changes.deleted_shopping_list_ids)),
+                },
+                "shopping_items": {
+                    "updated": changes.shopping_items(),
+                    "deleted": sorted(map(str, changes.deleted_shopping_item_ids)),
+                },
+                "members": {"added": members[True], "removed": members[False]},
+            }
+        )
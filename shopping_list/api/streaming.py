@@ -0,0 +1,104 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+
+from shopping_list.api.compiled import CompiledReadMixin
+
+
+def batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def aiterate(chunks):
+    # Each chunk is produced in the request's thread, where the iterator can
+    # read from the database, and sent before the next one is asked for.
+    next_chunk = sync_to_async(next)
+    done = object()
+    while (chunk := await next_chunk(chunks, done)) is not done:
+        yield chunk
+
+
+def render_json_array(batches, serialize):
+    # Each batch is rendered as an array whose brackets are dropped, so the
+    # body is the same as rendering every row at once.
+    renderer = JSONRenderer()
+    yield b"["
+    separator = b""
+    for batch in batches:
+        yield separator + renderer.render(serialize(batch))[1:-1]
+        separator = b","
+    yield b"]"
+
+
+async def arender_json_array(rows, size, serialize):
+    renderer = JSONRenderer()
+    yield b"["
+    separator = b""
+    batch = []
+    async for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield separator + renderer.render(serialize(batch))[1:-1]
+            separator = b","
+            batch = []
+    if batch:
+        yield separator + renderer.render(serialize(batch))[1:-1]
+    yield b"]"
+
+
+class StreamingListMixin(CompiledReadMixin):
+    """
+    With `?stream=1`, answer a list request with every row as one JSON array
+    instead of a page. The queryset is read in chunks of
+    SHOPPING_LIST_STREAM_CHUNK_SIZE rows (through a server-side cursor where
+    the database has one), and each chunk is written out before the next one
+    is read, so memory does not grow with the number of rows.
+    """
+
+    stream_query_param = "stream"
+
+    def wants_stream(self):
+        return self.request.query_params.get(self.stream_query_param) in ("1", "true")
+
+    def get_stream_chunk_size(self):
+        return getattr(settings, "SHOPPING_LIST_STREAM_CHUNK_SIZE", 2000)
+
+    def get_stream_queryset(self):
+        return self.get_read_queryset(self.filter_queryset(self.get_queryset()))
+
+    def serialize_batch(self, batch):
+        return self.get_serializer(batch, many=True).data
+
+    def streaming_response(self, chunks):
+        return StreamingHttpResponse(chunks, content_type="application/json")
+
+    def list(self, request, *args, **kwargs):
+        if not self.wants_stream():
+            return super().list(request, *args, **kwargs)
+
+        chunk_size = self.get_stream_chunk_size()
+        rows = self.get_stream_queryset().iterator(chunk_size=chunk_size)
+        chunks = render_json_array(batched(rows, chunk_size), self.serialize_batch)
+        # ASGI servers would read a sync iterator into memory before sending it.
+        if isinstance(request._request, ASGIRequest):
+            chunks = aiterate(chunks)
+        return self.streaming_response(chunks)
+
+    def astream_list(self, queryset):
+        chunk_size = self.get_stream_chunk_size()
+        return self.streaming_response(
+            arender_json_array(
+                queryset.aiterator(chunk_size=chunk_size),
+                chunk_size,
+                self.serialize_batch,
+            )
+        )
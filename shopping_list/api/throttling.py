@@ -1,9 +1,166 @@
-from rest_framework.throttling import UserRateThrottle
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.memcached import PyLibMCCache, PyMemcacheCache
+from django.core.cache.backends.redis import RedisCache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
 
+from typing import NamedTuple
+import time
 
-class MinuteRateThrottle(UserRateThrottle):
-    scope = "user_minute"
 
+# Backends whose incr() is a single atomic operation.
+ATOMIC_INCREMENT_CACHES = (LocMemCache, PyLibMCCache, PyMemcacheCache, RedisCache)
 
-class DailyRateThrottle(UserRateThrottle):
-    scope = "user_day"
+DURATIONS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    num_requests, period = rate.split("/")
+    return int(num_requests), DURATIONS[period[0]]
+
+
+class Window(NamedTuple):
+    key: str
+    number: int
+    num_requests: int
+    duration: int
+    remaining: float
+
+
+class FixedWindowRateThrottle(BaseThrottle):
+    """
+    Count the requests of each of `scopes` in fixed windows of their rate's
+    duration, keeping one counter per user and scope instead of a timestamp
+    per request. A client can make up to twice the rate across the boundary
+    of two windows.
+
+    On backends with an atomic incr() each counter is incremented in place,
+    and rolled back when another scope denies the request. Elsewhere all the
+    scopes are read with one get_many() and written with one set_many().
+    """
+
+    scopes = ()
+    anon_scopes = ()
+    cache_alias = DEFAULT_CACHE_ALIAS
+    cache_format = "throttle:{scope}:{ident}"
+    timer = time.time
+    atomic_increment = None
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def get_scopes(self, request):
+        if request.user and request.user.is_authenticated:
+            return self.scopes
+        return (*self.anon_scopes, *self.scopes)
+
+    def get_cache_ident(self, request):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return self.get_ident(request)
+
+    def get_windows(self, request):
+        rates = api_settings.DEFAULT_THROTTLE_RATES
+        ident = self.get_cache_ident(request)
+        now = self.timer()
+
+        windows = []
+        for scope in self.get_scopes(request):
+            if rates.get(scope) is None:
+                continue
+            num_requests, duration = parse_rate(rates[scope])
+            number = int(now // duration)
+            windows.append(
+                Window(
+                    key=self.cache_format.format(scope=scope, ident=ident),
+                    number=number,
+                    num_requests=num_requests,
+                    duration=duration,
+                    remaining=(number + 1) * duration - now,
+                )
+            )
+        return windows
+
+    def uses_atomic_increment(self):
+        if self.atomic_increment is not None:
+            return self.atomic_increment
+        return isinstance(self.cache, ATOMIC_INCREMENT_CACHES)
+
+    def allow_request(self, request, view):
+        windows = self.get_windows(request)
+        if not windows:
+            return True
+
+        if self.uses_atomic_increment():
+            self.denied = self.increment_atomically(windows)
+        else:
+            self.denied = self.increment_batched(windows)
+        return not self.denied
+
+    def increment_atomically(self, windows):
+        keys = [f"{window.key}:{window.number}" for window in windows]
+        counts = [
+            self._increment(key, window.duration) for key, window in zip(keys, windows)
+        ]
+        denied = [
+            window
+            for window, count in zip(windows, counts)
+            if count > window.num_requests
+        ]
+
+        if denied:
+            # Denied requests do not count towards any scope.
+            for key in keys:
+                try:
+                    self.cache.decr(key)
+                except ValueError:
+                    pass
+        return denied
+
+    def _increment(self, key, duration):
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            if self.cache.add(key, 1, duration):
+                return 1
+            return self.cache.incr(key)
+
+    def increment_batched(self, windows):
+        # Each counter is stored with its window number, so a counter left
+        # from an older window is simply restarted.
+        stored = self.cache.get_many([window.key for window in windows])
+        counts = {}
+        for window in windows:
+            number, count = stored.get(window.key, (window.number, 0))
+            counts[window.key] = count if number == window.number else 0
+
+        denied = [
+            window for window in windows if counts[window.key] >= window.num_requests
+        ]
+        if not denied:
+            self.cache.set_many(
+                {
+                    window.key: (window.number, counts[window.key] + 1)
+                    for window in windows
+                },
+                max(window.duration for window in windows),
+            )
+        return denied
+
+    def wait(self):
+        return max(window.remaining for window in self.denied)
+
+
+class DefaultRateThrottle(FixedWindowRateThrottle):
+    scopes = ("user_minute", "user_day")
+    anon_scopes = ("anon",)
+
+
+class MinuteRateThrottle(FixedWindowRateThrottle):
+    scopes = ("user_minute",)
+
+
+class DailyRateThrottle(FixedWindowRateThrottle):
+    scopes = ("user_day",)
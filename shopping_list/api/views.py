@@ -1,49 +1,116 @@
-from rest_framework import generics, filters
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework import exceptions, generics, filters, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema
 
-from shopping_list.models import ShoppingList, ShoppingItem
+from shopping_list.membership import is_member
+from shopping_list.models import ShoppingList, ShoppingItem, ShoppingListInboxEntry
+from shopping_list.export import ENCODERS, aexport_chunks, export_chunks
+from shopping_list.sync import get_changes, is_expired
+from shopping_list.api.caching import CachedResponseMixin
+from shopping_list.api.compiled import CompiledReadMixin
+from shopping_list.api.streaming import StreamingListMixin
 from shopping_list.api.serializers import (
     ShoppingListSerializer,
     ShoppingItemSerializer,
+    BulkShoppingItemSerializer,
     AddMemberSerializer,
     RemoveMemberSerializer,
+    SyncQuerySerializer,
+    SyncSerializer,
+    ExportQuerySerializer,
 )
 from shopping_list.api.permissions import (
     ShoppingListMembersOnly,
     ShoppingItemShoppingListMembersOnly,
     AllShoppingItemsShoppingListMembersOnly,
 )
-from shopping_list.api.pagination import LargerResultsSetPagination
+from shopping_list.api.filters import ShoppingItemSearchFilter
+from shopping_list.api.pagination import (
+    LargerResultsSetOrKeysetPagination,
+    PageNumberOrKeysetPagination,
+)
+
+
+class SyncTokenExpired(exceptions.APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = "The sync token has expired, sync again without one."
+    default_code = "sync_token_expired"
 
 
-class ListAddShoppingList(generics.ListCreateAPIView):
+def last_interaction_validators(shopping_list_id):
+    # None for a missing list, which is then left to the view's 404.
+    return (
+        ShoppingList.objects.filter(pk=shopping_list_id)
+        .values_list("last_interaction", flat=True)
+        .first()
+    )
+
+
+class ListAddShoppingList(
+    CachedResponseMixin, CompiledReadMixin, generics.ListCreateAPIView
+):
     serializer_class = ShoppingListSerializer
+    pagination_class = PageNumberOrKeysetPagination
 
     def perform_create(self, serializer):
         shopping_list = serializer.save()
         shopping_list.members.add(self.request.user)
+        ShoppingListInboxEntry.objects.filter(
+            user=self.request.user, shopping_list=shopping_list
+        ).update(role=ShoppingListInboxEntry.OWNER)
         return shopping_list
 
     def get_queryset(self):
-        return ShoppingList.objects.filter(members=self.request.user).order_by(
-            "-last_interaction"
+        return ShoppingList.objects.inbox(self.request.user).with_members()
+
+    def get_validators(self):
+        return list(
+            ShoppingListInboxEntry.objects.filter(user=self.request.user)
+            .order_by("shopping_list_id")
+            .values_list("shopping_list_id", "last_interaction")
         )
 
 
-class ShoppingListDetail(generics.RetrieveUpdateDestroyAPIView):
-    queryset = ShoppingList.objects.all()
+class ShoppingListDetail(
+    CachedResponseMixin, CompiledReadMixin, generics.RetrieveUpdateDestroyAPIView
+):
+    queryset = ShoppingList.objects.with_members()
     serializer_class = ShoppingListSerializer
     permission_classes = [ShoppingListMembersOnly]
+    cache_per_user = False
 
-
-class ListAddShoppingItem(generics.ListCreateAPIView):
+    def get_validators(self):
+        shopping_list_id = self.kwargs["pk"]
+        validators = last_interaction_validators(shopping_list_id)
+        # Members share the cached response, so check membership before using
+        # it, but only once the list is known to exist.
+        user = self.request.user
+        if (
+            validators is not None
+            and not user.is_superuser
+            and not is_member(user, shopping_list_id, self.request)
+        ):
+            self.permission_denied(self.request)
+        return validators
+
+
+class ListAddShoppingItem(
+    CachedResponseMixin, StreamingListMixin, generics.ListCreateAPIView
+):
     serializer_class = ShoppingItemSerializer
     permission_classes = [AllShoppingItemsShoppingListMembersOnly]
-    pagination_class = LargerResultsSetPagination
+    pagination_class = LargerResultsSetOrKeysetPagination
     filter_backends = [filters.OrderingFilter]
     ordering_fields = ["name", "purchased"]
+    cache_per_user = False
+
+    def get_validators(self):
+        return last_interaction_validators(self.kwargs["pk"])
 
     def get_queryset(self):
         shopping_list_id = self.kwargs["pk"]
@@ -54,7 +121,22 @@ class ListAddShoppingItem(generics.ListCreateAPIView):
         return queryset
 
 
-class ShoppingItemDetail(generics.RetrieveUpdateDestroyAPIView):
+class BulkShoppingItems(APIView):
+    permission_classes = [AllShoppingItemsShoppingListMembersOnly]
+
+    @extend_schema(
+        request=BulkShoppingItemSerializer, responses=BulkShoppingItemSerializer
+    )
+    def post(self, request, pk, format=None):
+        serializer = BulkShoppingItemSerializer(
+            data=request.data, context={"request": request}
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)
+
+
+class ShoppingItemDetail(CompiledReadMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = ShoppingItem.objects.all()
     serializer_class = ShoppingItemSerializer
     permission_classes = [ShoppingItemShoppingListMembersOnly]
@@ -87,14 +169,68 @@ class ShoppingListRemoveMembers(APIView):
         return Response(serializer.data)
 
 
-class SearchShoppingItems(generics.ListAPIView):
+class SearchShoppingItems(StreamingListMixin, generics.ListAPIView):
     serializer_class = ShoppingItemSerializer
+    pagination_class = PageNumberOrKeysetPagination
 
-    filter_backends = [filters.SearchFilter]
-    search_fields = ["name"]
+    filter_backends = [ShoppingItemSearchFilter]
 
     def get_queryset(self):
         users_shopping_lists = ShoppingList.objects.filter(members=self.request.user)
         queryset = ShoppingItem.objects.filter(shopping_list__in=users_shopping_lists)
 
         return queryset
+
+
+class SyncShoppingLists(APIView):
+    """
+    Rows of the user's shopping lists changed since `sync_token`, with
+    tombstones for the deleted ones. Without a token everything is returned.
+    Keep calling with the returned token while `has_more` is true.
+    """
+
+    @extend_schema(parameters=[SyncQuerySerializer], responses=SyncSerializer)
+    def get(self, request, format=None):
+        query = SyncQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        sync_token = query.validated_data.get("sync_token")
+
+        if sync_token is not None and is_expired(sync_token.change_id):
+            raise SyncTokenExpired()
+
+        changes = get_changes(
+            request.user,
+            sync_token,
+            limit=getattr(settings, "SHOPPING_LIST_SYNC_MAX_CHANGES", 500),
+        )
+        return Response(SyncSerializer(changes).data)
+
+
+class ExportShoppingLists(APIView):
+    """
+    Every shopping list of the user with its members and items, streamed in
+    one response as NDJSON (one record per line) or CSV.
+    """
+
+    @extend_schema(
+        parameters=[ExportQuerySerializer],
+        responses={
+            (200, "application/x-ndjson"): OpenApiTypes.STR,
+            (200, "text/csv"): OpenApiTypes.STR,
+        },
+    )
+    def get(self, request, format=None):
+        query = ExportQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        encoder = ENCODERS[query.validated_data["export_format"]]()
+        chunk_size = getattr(settings, "SHOPPING_LIST_STREAM_CHUNK_SIZE", 2000)
+
+        # ASGI servers would read a sync iterator into memory before sending it.
+        if isinstance(request._request, ASGIRequest):
+            chunks = aexport_chunks(request.user, encoder, chunk_size)
+        else:
+            chunks = export_chunks(request.user, encoder, chunk_size)
+
+        response = StreamingHttpResponse(chunks, content_type=encoder.content_type)
+        response["Content-Disposition"] = f'attachment; filename="{encoder.filename}"'
+        return response
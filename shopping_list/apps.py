@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class ShoppingListConfig(AppConfig):
@@ -6,4 +7,14 @@ class ShoppingListConfig(AppConfig):
     name = "shopping_list"
 
     def ready(self):
+        import shopping_list.api.authentication
+        import shopping_list.checks
         import shopping_list.receivers
+
+        from shopping_list.instrumentation import (
+            install_query_recorder,
+            instrumentation_enabled,
+        )
+
+        if instrumentation_enabled():
+            connection_created.connect(install_query_recorder)
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+
+SHARED_CACHE_SETTINGS = [
+    ("SHOPPING_LIST_MEMBERSHIP_CACHE_TIMEOUT", "shopping_list.E001"),
+    ("SHOPPING_LIST_TOKEN_CACHE_TIMEOUT", "shopping_list.E002"),
+]
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_caches(app_configs, **kwargs):
+    # Invalidation only reaches the cache of the process making the change.
+    if not isinstance(caches["default"], LocMemCache):
+        return []
+    return [
+        checks.Error(
+            f"{setting} needs a default cache shared by every process.",
+            hint=f"Use a shared cache backend such as Redis, or set {setting} to 0.",
+            id=check_id,
+        )
+        for setting, check_id in SHARED_CACHE_SETTINGS
+        if getattr(settings, setting, 0)
+    ]
@@ -0,0 +1,93 @@
+from functools import cache
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+import asyncio
+import threading
+
+
+class BaseEventBroker:
+    def publish(self, event):
+        raise NotImplementedError
+
+    async def subscribe(self, heartbeat=None):
+        """
+        Yield every event published from now on, and None whenever `heartbeat`
+        seconds pass without one.
+        """
+        raise NotImplementedError
+        yield
+
+
+class InProcessEventBroker(BaseEventBroker):
+    """
+    Fan events out to the subscribers of this process only.
+
+    `publish` may be called from any thread; each subscriber gets the event on
+    its own event loop. Slow subscribers drop events once `max_queue_size` are
+    waiting rather than growing without bound.
+    """
+
+    max_queue_size = 1000
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._put, queue, event)
+            except RuntimeError:
+                # The subscriber's loop is closed.
+                pass
+
+    @staticmethod
+    def _put(queue, event):
+        if not queue.full():
+            queue.put_nowait(event)
+
+    async def subscribe(self, heartbeat=None):
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(self.max_queue_size))
+        with self._lock:
+            self._subscribers.add(subscriber)
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(subscriber[1].get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
+
+
+@cache
+def _load_event_broker(path):
+    return import_string(path)()
+
+
+def get_event_broker():
+    return _load_event_broker(
+        getattr(
+            settings,
+            "SHOPPING_LIST_EVENT_BROKER",
+            "shopping_list.events.InProcessEventBroker",
+        )
+    )
+
+
+def publish_event(event_type, shopping_list_id, **data):
+    event = {"type": event_type, "shopping_list": str(shopping_list_id), **data}
+    transaction.on_commit(lambda: get_event_broker().publish(event))
+
+
+def shopping_item_event_data(shopping_item):
+    return {
+        "id": str(shopping_item.id),
+        "name": shopping_item.name,
+        "purchased": shopping_item.purchased,
+    }
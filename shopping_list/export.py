@@ -0,0 +1,173 @@
+from asgiref.sync import sync_to_async
+from django.db.models import (
+    BooleanField,
+    DateTimeField,
+    F,
+    IntegerField,
+    UUIDField,
+    Value,
+)
+from rest_framework.utils.encoders import JSONEncoder
+
+from shopping_list.membership import shopping_list_ids
+from shopping_list.models import ShoppingItem, ShoppingList
+
+from itertools import islice
+import csv
+import io
+
+
+LIST, MEMBER, ITEM = 0, 1, 2
+RECORD_TYPES = {LIST: "list", MEMBER: "member", ITEM: "item"}
+
+COLUMNS = (
+    "list_id",
+    "record",
+    "item_id",
+    "user_id",
+    "name",
+    "purchased",
+    "last_interaction",
+)
+
+CSV_HEADER = ("type", "shopping_list", "id", "name", "purchased", "last_interaction")
+
+
+def _none(output_field):
+    return Value(None, output_field=output_field)
+
+
+def export_rows(user):
+    """
+    Every shopping list `user` belongs to, followed by its members and items,
+    as one UNION ALL query ordered by list. Rows are tuples of COLUMNS.
+    """
+    visible_ids = shopping_list_ids(user)
+
+    shopping_lists = (
+        ShoppingList.objects.filter(pk__in=visible_ids)
+        .annotate(
+            list_id=F("id"),
+            record=Value(LIST, output_field=IntegerField()),
+            item_id=_none(UUIDField()),
+            user_id=_none(IntegerField()),
+            purchased=_none(BooleanField()),
+        )
+        .values_list(*COLUMNS)
+    )
+    members = (
+        ShoppingList.members.through.objects.filter(shoppinglist_id__in=visible_ids)
+        .annotate(
+            list_id=F("shoppinglist_id"),
+            record=Value(MEMBER, output_field=IntegerField()),
+            item_id=_none(UUIDField()),
+            name=F("user__username"),
+            purchased=_none(BooleanField()),
+            last_interaction=_none(DateTimeField()),
+        )
+        .values_list(*COLUMNS)
+    )
+    shopping_items = (
+        ShoppingItem.objects.filter(shopping_list_id__in=visible_ids)
+        .annotate(
+            list_id=F("shopping_list_id"),
+            record=Value(ITEM, output_field=IntegerField()),
+            item_id=F("id"),
+            user_id=_none(IntegerField()),
+            last_interaction=_none(DateTimeField()),
+        )
+        .values_list(*COLUMNS)
+    )
+    return shopping_lists.union(members, shopping_items, all=True).order_by(
+        "list_id", "record", "name"
+    )
+
+
+def ndjson_record(row):
+    list_id, record, item_id, user_id, name, purchased, last_interaction = row
+    if record == LIST:
+        data = {"id": list_id, "name": name, "last_interaction": last_interaction}
+    elif record == MEMBER:
+        data = {"shopping_list": list_id, "id": user_id, "username": name}
+    else:
+        data = {
+            "shopping_list": list_id,
+            "id": item_id,
+            "name": name,
+            "purchased": purchased,
+        }
+    return {"type": RECORD_TYPES[record], **data}
+
+
+def csv_record(row):
+    list_id, record, item_id, user_id, name, purchased, last_interaction = row
+    return (
+        RECORD_TYPES[record],
+        list_id,
+        {LIST: list_id, MEMBER: user_id, ITEM: item_id}[record],
+        name,
+        "" if purchased is None else str(purchased).lower(),
+        "" if last_interaction is None else last_interaction.isoformat(),
+    )
+
+
+class NDJSONEncoder:
+    content_type = "application/x-ndjson"
+    filename = "shopping-lists.ndjson"
+
+    def __init__(self):
+        self.encoder = JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def header(self):
+        return ""
+
+    def encode(self, row):
+        return self.encoder.encode(ndjson_record(row)) + "\n"
+
+
+class CSVEncoder:
+    content_type = "text/csv; charset=utf-8"
+    filename = "shopping-lists.csv"
+
+    def __init__(self):
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+
+    def line(self, values):
+        self.writer.writerow(values)
+        line = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return line
+
+    def header(self):
+        return self.line(CSV_HEADER)
+
+    def encode(self, row):
+        return self.line(csv_record(row))
+
+
+ENCODERS = {"ndjson": NDJSONEncoder, "csv": CSVEncoder}
+
+
+def export_chunks(user, encoder, chunk_size):
+    # Each chunk of rows read from the cursor is written out as one piece.
+    rows = export_rows(user).iterator(chunk_size=chunk_size)
+    header = encoder.header()
+    while batch := list(islice(rows, chunk_size)):
+        yield (header + "".join(map(encoder.encode, batch))).encode()
+        header = ""
+    if header:
+        yield header.encode()
+
+
+async def aexport_chunks(user, encoder, chunk_size):
+    # Not aiterator(): it would run a values_list() query in the event loop.
+    rows = export_rows(user).iterator(chunk_size=chunk_size)
+    next_batch = sync_to_async(lambda: list(islice(rows, chunk_size)))
+    header = encoder.header()
+    while batch := await next_batch():
+        yield (header + "".join(map(encoder.encode, batch))).encode()
+        header = ""
+    if header:
+        yield header.encode()
@@ -0,0 +1,244 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed, PermissionDenied
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+
+from bisect import bisect_left
+from contextvars import ContextVar
+import threading
+import time
+
+
+_current = ContextVar("shopping_list_request_timings", default=None)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+def instrumentation_enabled():
+    return getattr(settings, "SHOPPING_LIST_INSTRUMENTATION", False)
+
+
+def server_timing_enabled():
+    return getattr(settings, "SHOPPING_LIST_SERVER_TIMING", False)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+        self.total = None
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    def server_timing(self):
+        return ", ".join(
+            [
+                f'db;dur={self.db * 1000:.2f};desc="{self.queries} queries"',
+                f"serialize;dur={self.serialize * 1000:.2f}",
+                f"total;dur={self.total * 1000:.2f}",
+            ]
+        )
+
+
+def record_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db += time.perf_counter() - started
+        timings.queries += 1
+
+
+def install_query_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self):
+        cumulative = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            cumulative += count
+            yield bound, cumulative
+
+
+class Metrics:
+    """
+    Per-view histograms of the instrumented requests, kept in process and
+    rendered in the Prometheus text format.
+    """
+
+    families = {
+        "request_duration_seconds": ("Request latency.", DURATION_BUCKETS),
+        "db_duration_seconds": ("Time spent in SQL queries.", DURATION_BUCKETS),
+        "serialize_duration_seconds": (
+            "Time spent rendering the response.",
+            DURATION_BUCKETS,
+        ),
+        "db_queries": ("SQL queries run by a request.", QUERY_COUNT_BUCKETS),
+    }
+
+    def __init__(self, prefix="shopping_list"):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.histograms = {name: {} for name in self.families}
+
+    def observe(self, view, timings):
+        values = {
+            "request_duration_seconds": timings.total,
+            "db_duration_seconds": timings.db,
+            "serialize_duration_seconds": timings.serialize,
+            "db_queries": timings.queries,
+        }
+        with self.lock:
+            for name, value in values.items():
+                histograms = self.histograms[name]
+                if view not in histograms:
+                    histograms[view] = Histogram(self.families[name][1])
+                histograms[view].observe(value)
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name, (description, _) in self.families.items():
+                metric = f"{self.prefix}_{name}"
+                lines += [
+                    f"# HELP {metric} {description}",
+                    f"# TYPE {metric} histogram",
+                ]
+                for view, histogram in sorted(self.histograms[name].items()):
+                    for bound, count in histogram.samples():
+                        lines.append(
+                            f'{metric}_bucket{{view="{view}",le="{bound}"}} {count}'
+                        )
+                    lines.append(f'{metric}_sum{{view="{view}"}} {histogram.sum}')
+                    lines.append(
+                        f'{metric}_count{{view="{view}"}} {sum(histogram.counts)}'
+                    )
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {name: {} for name in self.families}
+
+
+metrics = Metrics()
+
+
+def view_name(request):
+    resolver_match = getattr(request, "resolver_match", None)
+    if resolver_match is None:
+        return "unresolved"
+    return resolver_match.view_name or resolver_match._func_path
+
+
+class InstrumentationMiddleware:
+    """
+    Time each request, its SQL queries and the rendering of its response, add
+    them to the histograms served by /metrics and, when
+    SHOPPING_LIST_SERVER_TIMING is set, as a Server-Timing header.
+
+    Removes itself when SHOPPING_LIST_INSTRUMENTATION is off, so it then costs
+    nothing. Should come first in MIDDLEWARE to cover the whole request.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not instrumentation_enabled():
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+        # Connections opened later, e.g. in the threads of sync_to_async, get
+        # the recorder from the connection_created receiver of the app config.
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after this hook, and before the response
+        # gets back to __call__.
+        timings = _current.get()
+        if timings is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                timings.serialize += time.perf_counter() - started
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, request, response, timings):
+        timings.finish()
+        if server_timing_enabled():
+            response["Server-Timing"] = timings.server_timing()
+        metrics.observe(view_name(request), timings)
+        return response
+
+
+def can_read_metrics(request):
+    token = getattr(settings, "SHOPPING_LIST_METRICS_TOKEN", None)
+    authorization = request.headers.get("Authorization", "")
+    if token and constant_time_compare(authorization, f"Bearer {token}"):
+        return True
+    user = getattr(request, "user", None)
+    return user is not None and user.is_staff
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Prometheus text exposition of the request metrics of this process, for
+    staff users and scrapers sending SHOPPING_LIST_METRICS_TOKEN.
+    """
+    if not instrumentation_enabled():
+        raise Http404
+    if not can_read_metrics(request):
+        raise PermissionDenied
+    return HttpResponse(
+        metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
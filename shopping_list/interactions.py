@@ -0,0 +1,241 @@
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from shopping_list.models import (
+    ShoppingItem,
+    ShoppingList,
+    ShoppingListInboxEntry,
+    UNPURCHASED_ITEMS_PREVIEW_SIZE,
+)
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+import uuid
+
+
+_pending_touches = ContextVar("pending_shopping_list_touches", default=None)
+
+SUMMARY_FIELDS = ["item_count", "unpurchased_item_count", "unpurchased_items_preview"]
+
+
+def item_state(shopping_item):
+    return (shopping_item.shopping_list_id, shopping_item.purchased)
+
+
+def item_count_changes(*changes):
+    """
+    Map the shopping lists of the given `(old, new)` item states to the
+    number of items and unpurchased items they gained. A state is None
+    before an item is created and after it is deleted.
+    """
+    counts = {}
+    for old, new in changes:
+        for state, sign in [(old, -1), (new, 1)]:
+            if state is None:
+                continue
+            shopping_list_id, purchased = state
+            items, unpurchased = counts.get(shopping_list_id, (0, 0))
+            counts[shopping_list_id] = (
+                items + sign,
+                unpurchased + (0 if purchased else sign),
+            )
+    return counts
+
+
+def touch_shopping_lists(*shopping_list_ids, counts=None, recount=False):
+    """
+    Bump `last_interaction` of the given shopping lists and their members'
+    inbox entries, and refresh their item summaries.
+
+    `counts` maps more shopping lists to the items and unpurchased items they
+    gained, see `item_count_changes()`. The item counts are only read again
+    with `recount`, when the change is not known.
+
+    Inside `coalesce_touches()` the changes are only collected and written
+    once when the outermost block exits.
+    """
+    changes = {}
+    for shopping_list_id, count in [
+        *((shopping_list_id, (0, 0)) for shopping_list_id in shopping_list_ids),
+        *(counts or {}).items(),
+    ]:
+        add_item_count(changes, shopping_list_id, None if recount else count)
+
+    pending = _pending_touches.get()
+    if pending is None:
+        update_shopping_lists(changes)
+        return
+
+    for shopping_list_id, count in changes.items():
+        add_item_count(pending, shopping_list_id, count)
+
+
+def add_item_count(changes, shopping_list_id, count):
+    # None stands for a recount, which also covers every other change.
+    shopping_list_id = uuid.UUID(str(shopping_list_id))
+    previous = changes.get(shopping_list_id, (0, 0))
+    if previous is None or count is None:
+        changes[shopping_list_id] = None
+    else:
+        changes[shopping_list_id] = (previous[0] + count[0], previous[1] + count[1])
+
+
+@contextmanager
+def coalesce_touches():
+    if _pending_touches.get() is not None:
+        yield
+        return
+
+    pending = {}
+    token = _pending_touches.set(pending)
+    try:
+        yield
+    finally:
+        _pending_touches.reset(token)
+
+    if pending:
+        update_shopping_lists(pending)
+
+
+def update_shopping_lists(changes):
+    recount = [
+        shopping_list_id for shopping_list_id, count in changes.items() if count is None
+    ]
+    update_item_summaries(recount)
+    count_items(
+        {
+            shopping_list_id: count
+            for shopping_list_id, count in changes.items()
+            if count is not None
+        }
+    )
+
+
+def lock_shopping_lists(shopping_list_ids):
+    if connection.features.has_select_for_update:
+        # Concurrent writers to a list wait for each other here, so each
+        # reads the items the other one committed.
+        list(
+            ShoppingList.objects.select_for_update()
+            .filter(pk__in=shopping_list_ids)
+            .values_list("pk", flat=True)
+        )
+
+
+def unpurchased_items_preview(shopping_list_id):
+    # Read in order from the unique_unpurchased_item_name partial index.
+    return list(
+        ShoppingItem.objects.filter(shopping_list_id=shopping_list_id, purchased=False)
+        .order_by("name")
+        .values_list("name", flat=True)[:UNPURCHASED_ITEMS_PREVIEW_SIZE]
+    )
+
+
+def count_items(counts):
+    """
+    Add `counts` to the item counts of their shopping lists, refresh their
+    unpurchased items preview, and touch them.
+    """
+    if not counts:
+        return
+
+    with transaction.atomic():
+        lock_shopping_lists(counts)
+        now = timezone.now()
+        ShoppingList.objects.bulk_update(
+            [
+                ShoppingList(
+                    pk=shopping_list_id,
+                    last_interaction=now,
+                    item_count=F("item_count") + items,
+                    unpurchased_item_count=F("unpurchased_item_count") + unpurchased,
+                    unpurchased_items_preview=unpurchased_items_preview(
+                        shopping_list_id
+                    ),
+                )
+                for shopping_list_id, (items, unpurchased) in counts.items()
+            ],
+            ["last_interaction", *SUMMARY_FIELDS],
+        )
+        ShoppingListInboxEntry.objects.filter(shopping_list_id__in=counts).update(
+            last_interaction=now
+        )
+
+
+def item_summaries(shopping_list_ids):
+    # One row per list for the counts, plus one per name of the preview.
+    rows = (
+        ShoppingItem.objects.filter(shopping_list_id__in=shopping_list_ids)
+        .annotate(
+            position=Window(
+                RowNumber(),
+                partition_by=[F("shopping_list_id"), F("purchased")],
+                order_by=[F("name").asc(), F("id").asc()],
+            ),
+            item_count=Window(Count("id"), partition_by=[F("shopping_list_id")]),
+            unpurchased_item_count=Window(
+                Count("id", filter=Q(purchased=False)),
+                partition_by=[F("shopping_list_id")],
+            ),
+        )
+        .filter(position__lte=UNPURCHASED_ITEMS_PREVIEW_SIZE)
+        .order_by("shopping_list_id", "purchased", "position")
+        .values_list(
+            "shopping_list_id",
+            "name",
+            "purchased",
+            "item_count",
+            "unpurchased_item_count",
+        )
+    )
+
+    summaries = {}
+    for shopping_list_id, name, purchased, item_count, unpurchased_count in rows:
+        summary = summaries.setdefault(
+            shopping_list_id,
+            {
+                "item_count": item_count,
+                "unpurchased_item_count": unpurchased_count,
+                "unpurchased_items_preview": [],
+            },
+        )
+        if not purchased:
+            summary["unpurchased_items_preview"].append(name)
+    return summaries
+
+
+def update_item_summaries(shopping_list_ids, touch=True):
+    # Counts every item of the lists again, where item writes only add their
+    # change through count_items().
+    shopping_list_ids = {
+        uuid.UUID(str(shopping_list_id)) for shopping_list_id in shopping_list_ids
+    }
+    if not shopping_list_ids:
+        return
+
+    with transaction.atomic():
+        lock_shopping_lists(shopping_list_ids)
+        summaries = item_summaries(shopping_list_ids)
+        empty = {
+            "item_count": 0,
+            "unpurchased_item_count": 0,
+            "unpurchased_items_preview": [],
+        }
+        now = timezone.now()
+        ShoppingList.objects.bulk_update(
+            [
+                ShoppingList(
+                    pk=shopping_list_id,
+                    last_interaction=now,
+                    **summaries.get(shopping_list_id, empty),
+                )
+                for shopping_list_id in shopping_list_ids
+            ],
+            ["last_interaction", *SUMMARY_FIELDS] if touch else SUMMARY_FIELDS,
+        )
+        if touch:
+            ShoppingListInboxEntry.objects.filter(
+                shopping_list_id__in=shopping_list_ids
+            ).update(last_interaction=now)
@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, OperationalError, connection
+
+from shopping_list.models import ShoppingItem, ShoppingList
+
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+import json
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Create shopping items from concurrent workers, one list each, and "
+        "print the write throughput as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--items", type=int, default=100)
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(username="benchmark")
+        shopping_lists = [
+            ShoppingList.objects.create(name=f"benchmark {worker}")
+            for worker in range(options["workers"])
+        ]
+        for shopping_list in shopping_lists:
+            shopping_list.members.add(user)
+
+        def create_items(shopping_list):
+            errors = 0
+            try:
+                for index in range(options["items"]):
+                    try:
+                        ShoppingItem.objects.create(
+                            name=f"item {index}",
+                            purchased=False,
+                            shopping_list=shopping_list,
+                        )
+                    except (IntegrityError, OperationalError):
+                        # Lock timeouts and the like count against the
+                        # throughput; anything else stops the benchmark.
+                        errors += 1
+            finally:
+                connection.close()
+            return errors
+
+        started = perf_counter()
+        with ThreadPoolExecutor(options["workers"]) as executor:
+            futures = [
+                executor.submit(create_items, shopping_list)
+                for shopping_list in shopping_lists
+            ]
+        failures = [
+            future.exception() for future in futures if future.exception() is not None
+        ]
+        if failures:
+            raise CommandError(
+                f"{len(failures)} of {len(futures)} workers failed, the first "
+                f"with {failures[0]!r}"
+            ) from failures[0]
+        errors = sum(future.result() for future in futures)
+        seconds = perf_counter() - started
+
+        items = options["workers"] * options["items"] - errors
+        self.stdout.write(
+            json.dumps(
+                {
+                    "profile": settings.DATABASE_PROFILE,
+                    "engine": settings.DATABASE_ENGINE,
+                    "workers": options["workers"],
+                    "items": items,
+                    "errors": errors,
+                    "seconds": round(seconds, 3),
+                    "items_per_second": round(items / seconds, 1),
+                }
+            )
+        )
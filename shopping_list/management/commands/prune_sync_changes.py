@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from django.utils import timezone
+
+from shopping_list.models import ShoppingListChange
+
+from datetime import timedelta
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the sync change log entries older than the retention period, "
+        "except the newest one. Clients holding an older sync token have to "
+        "sync from scratch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=getattr(settings, "SHOPPING_LIST_SYNC_RETENTION_DAYS", 30),
+        )
+
+    def handle(self, *args, **options):
+        # The newest change stays, so that the log is never emptied and tokens
+        # can always be told apart from pruned ones.
+        newest = ShoppingListChange.objects.aggregate(id=Max("id"))["id"]
+        deleted, _ = ShoppingListChange.objects.filter(
+            created_at__lt=timezone.now() - timedelta(days=options["days"]),
+            id__lt=newest or 0,
+        ).delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} changes"))
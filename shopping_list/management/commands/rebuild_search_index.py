@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from shopping_list.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the shopping item search index of the configured backend."
+
+    def handle(self, *args, **options):
+        search_backend = get_search_backend()
+        search_backend.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt {type(search_backend).__name__} index")
+        )
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from shopping_list.interactions import update_item_summaries
+from shopping_list.models import ShoppingList
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the item counts and unpurchased items preview stored on "
+        "every shopping list, without changing their last interaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        shopping_list_ids = list(ShoppingList.objects.values_list("pk", flat=True))
+        batch_size = options["batch_size"]
+        for start in range(0, len(shopping_list_ids), batch_size):
+            update_item_summaries(
+                shopping_list_ids[start : start + batch_size], touch=False
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt {len(shopping_list_ids)} shopping lists")
+        )
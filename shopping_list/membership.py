@@ -0,0 +1,90 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from shopping_list.models import ShoppingList
+
+
+REQUEST_CACHE_ATTRIBUTE = "_shopping_list_membership_cache"
+
+
+def _cache_key(user_id, shopping_list_id):
+    return f"shopping-list-membership:{shopping_list_id}:{user_id}"
+
+
+def _cache_timeout():
+    return getattr(settings, "SHOPPING_LIST_MEMBERSHIP_CACHE_TIMEOUT", 0)
+
+
+def _request_cache(request):
+    if request is None:
+        return None
+    return request.__dict__.setdefault(REQUEST_CACHE_ATTRIBUTE, {})
+
+
+def _memberships(user, shopping_list_id):
+    return ShoppingList.members.through.objects.filter(
+        shoppinglist_id=shopping_list_id, user_id=user.pk
+    )
+
+
+def is_member(user, shopping_list_id, request=None):
+    """
+    Tell whether `user` belongs to the shopping list without loading its members.
+
+    Verdicts are remembered on `request` for the rest of the request and, when
+    SHOPPING_LIST_MEMBERSHIP_CACHE_TIMEOUT is set, in the default cache.
+    """
+    key = _cache_key(user.pk, shopping_list_id)
+    request_cache = _request_cache(request)
+    if request_cache is not None and key in request_cache:
+        return request_cache[key]
+
+    timeout = _cache_timeout()
+    verdict = cache.get(key) if timeout else None
+    if verdict is None:
+        verdict = _memberships(user, shopping_list_id).exists()
+        if timeout:
+            cache.set(key, verdict, timeout)
+
+    if request_cache is not None:
+        request_cache[key] = verdict
+
+    return verdict
+
+
+async def ais_member(user, shopping_list_id, request=None):
+    key = _cache_key(user.pk, shopping_list_id)
+    request_cache = _request_cache(request)
+    if request_cache is not None and key in request_cache:
+        return request_cache[key]
+
+    timeout = _cache_timeout()
+    verdict = await cache.aget(key) if timeout else None
+    if verdict is None:
+        verdict = await _memberships(user, shopping_list_id).aexists()
+        if timeout:
+            await cache.aset(key, verdict, timeout)
+
+    if request_cache is not None:
+        request_cache[key] = verdict
+
+    return verdict
+
+
+def invalidate_memberships(pairs):
+    """
+    Forget the cached verdicts of (user id, shopping list id) `pairs`.
+    """
+    if _cache_timeout():
+        cache.delete_many(
+            [
+                _cache_key(user_id, shopping_list_id)
+                for user_id, shopping_list_id in pairs
+            ]
+        )
+
+
+def shopping_list_ids(user):
+    return ShoppingList.members.through.objects.filter(user_id=user.pk).values_list(
+        "shoppinglist_id", flat=True
+    )
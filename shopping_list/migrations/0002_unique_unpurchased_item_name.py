@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-18 04:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopping_list', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='shoppingitem',
+            constraint=models.UniqueConstraint(condition=models.Q(('purchased', False)), fields=('shopping_list', 'name'), name='unique_unpurchased_item_name'),
+        ),
+    ]
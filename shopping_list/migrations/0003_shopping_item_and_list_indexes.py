@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-18 04:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopping_list', '0002_unique_unpurchased_item_name'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='shoppingitem',
+            name='shopping_list',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='shopping_items', to='shopping_list.shoppinglist'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppingitem',
+            index=models.Index(fields=['shopping_list', 'purchased', 'name'], name='item_list_purchased_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppinglist',
+            index=models.Index(fields=['-last_interaction'], name='list_last_interaction_idx'),
+        ),
+    ]
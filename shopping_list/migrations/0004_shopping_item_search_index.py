@@ -0,0 +1,88 @@
+# Generated by Django 5.2.1 on 2026-10-18 04:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+import re
+
+
+# Copied from shopping_list.search as it was when this migration was written,
+# so that later changes to the search backends leave it as it is.
+FTS_TABLE = 'shopping_list_shoppingitem_fts'
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def word_trigrams(word):
+    padded = f'  {word} '
+    return {padded[index : index + 3] for index in range(len(padded) - 2)}
+
+
+def fts5_available(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return 'ENABLE_FTS5' in {row[0] for row in cursor.fetchall()}
+
+
+def create_search_index(apps, schema_editor):
+    # Fill the index the default search backend will use, see get_search_backend().
+    connection = schema_editor.connection
+    if fts5_available(connection):
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} "
+            "USING fts5(name, item_id, shopping_list_id UNINDEXED)"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (name, item_id, shopping_list_id) "
+            "SELECT name, id, shopping_list_id FROM shopping_list_shoppingitem"
+        )
+        return
+
+    ShoppingItem = apps.get_model('shopping_list', 'ShoppingItem')
+    ShoppingItemTrigram = apps.get_model('shopping_list', 'ShoppingItemTrigram')
+    ShoppingItemTrigram.objects.bulk_create(
+        (
+            ShoppingItemTrigram(
+                shopping_item_id=shopping_item.id,
+                shopping_list_id=shopping_item.shopping_list_id,
+                trigram=trigram,
+            )
+            for shopping_item in ShoppingItem.objects.iterator(chunk_size=2000)
+            for trigram in set().union(*map(word_trigrams, tokenize(shopping_item.name)))
+        ),
+        batch_size=2000,
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopping_list', '0003_shopping_item_and_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingItemTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('shopping_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='shopping_list.shoppingitem')),
+                ('shopping_list', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='shopping_list.shoppinglist')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['trigram', 'shopping_list'], name='item_trigram_list_idx')],
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
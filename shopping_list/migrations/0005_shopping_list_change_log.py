@@ -0,0 +1,53 @@
+# Generated by Django 5.2.1 on 2026-10-18 04:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shopping_list", "0004_shopping_item_search_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ShoppingListChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("shopping_list_id", models.UUIDField()),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("list", "Shopping list"),
+                            ("item", "Shopping item"),
+                            ("member", "Member"),
+                        ],
+                        max_length=6,
+                    ),
+                ),
+                ("object_id", models.CharField(max_length=36)),
+                ("deleted", models.BooleanField(default=False)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["shopping_list_id", "id"], name="change_list_idx"
+                    ),
+                    models.Index(
+                        fields=["kind", "object_id", "id"], name="change_object_idx"
+                    ),
+                    models.Index(fields=["created_at"], name="change_created_at_idx"),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.1 on 2026-10-18 04:58
+
+from django.db import migrations, models
+
+PREVIEW_SIZE = 3
+
+
+def fill_item_summaries(apps, schema_editor):
+    # One ordered pass over the items instead of queries per list.
+    ShoppingList = apps.get_model("shopping_list", "ShoppingList")
+    ShoppingItem = apps.get_model("shopping_list", "ShoppingItem")
+
+    summaries = {}
+    for shopping_list_id, name, purchased in (
+        ShoppingItem.objects.order_by("shopping_list_id", "name", "id")
+        .values_list("shopping_list_id", "name", "purchased")
+        .iterator(chunk_size=2000)
+    ):
+        summary = summaries.setdefault(
+            shopping_list_id,
+            ShoppingList(
+                pk=shopping_list_id,
+                item_count=0,
+                unpurchased_item_count=0,
+                unpurchased_items_preview=[],
+            ),
+        )
+        summary.item_count += 1
+        if not purchased:
+            summary.unpurchased_item_count += 1
+            if len(summary.unpurchased_items_preview) < PREVIEW_SIZE:
+                summary.unpurchased_items_preview.append(name)
+
+    ShoppingList.objects.bulk_update(
+        summaries.values(),
+        ["item_count", "unpurchased_item_count", "unpurchased_items_preview"],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shopping_list", "0005_shopping_list_change_log"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="shoppinglist",
+            name="item_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="shoppinglist",
+            name="unpurchased_item_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="shoppinglist",
+            name="unpurchased_items_preview",
+            field=models.JSONField(default=list, editable=False),
+        ),
+        migrations.RunPython(fill_item_summaries, migrations.RunPython.noop),
+    ]
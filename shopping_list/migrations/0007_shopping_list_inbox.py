@@ -0,0 +1,101 @@
+# Generated by Django 5.2.1 on 2026-10-18 05:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_inbox_entries(apps, schema_editor):
+    # The first member of a list is the one who created it.
+    ShoppingList = apps.get_model("shopping_list", "ShoppingList")
+    ShoppingListInboxEntry = apps.get_model("shopping_list", "ShoppingListInboxEntry")
+    Membership = ShoppingList.members.through
+
+    last_interactions = dict(
+        ShoppingList.objects.values_list("id", "last_interaction").iterator(
+            chunk_size=2000
+        )
+    )
+    owned = set()
+    entries = []
+    for user_id, shopping_list_id in (
+        Membership.objects.order_by("shoppinglist_id", "id")
+        .values_list("user_id", "shoppinglist_id")
+        .iterator(chunk_size=2000)
+    ):
+        role = "member" if shopping_list_id in owned else "owner"
+        owned.add(shopping_list_id)
+        entries.append(
+            ShoppingListInboxEntry(
+                user_id=user_id,
+                shopping_list_id=shopping_list_id,
+                last_interaction=last_interactions[shopping_list_id],
+                role=role,
+            )
+        )
+
+    ShoppingListInboxEntry.objects.bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shopping_list", "0006_shopping_list_item_summaries"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ShoppingListInboxEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("last_interaction", models.DateTimeField()),
+                (
+                    "role",
+                    models.CharField(
+                        choices=[("owner", "Owner"), ("member", "Member")],
+                        default="member",
+                        max_length=6,
+                    ),
+                ),
+                (
+                    "shopping_list",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="inbox_entries",
+                        to="shopping_list.shoppinglist",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["user", "-last_interaction", "shopping_list"],
+                        name="inbox_user_interaction_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "shopping_list"), name="unique_inbox_entry"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(fill_inbox_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:08
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Length
+
+
+def fill_name_lengths(apps, schema_editor):
+    ShoppingItem = apps.get_model("shopping_list", "ShoppingItem")
+    ShoppingItemTrigram = apps.get_model("shopping_list", "ShoppingItemTrigram")
+    ShoppingItemTrigram.objects.update(
+        name_length=Subquery(
+            ShoppingItem.objects.filter(pk=OuterRef("shopping_item_id")).values(
+                length=Length("name")
+            )[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shopping_list", "0007_shopping_list_inbox"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="shoppingitemtrigram",
+            name="item_trigram_list_idx",
+        ),
+        migrations.AddField(
+            model_name="shoppingitemtrigram",
+            name="name_length",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_name_lengths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="shoppingitemtrigram",
+            index=models.Index(
+                fields=["trigram", "shopping_list", "name_length", "shopping_item"],
+                name="item_trigram_rank_idx",
+            ),
+        ),
+    ]
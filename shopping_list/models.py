@@ -1,18 +1,51 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
 
 import uuid
 
 
+UNPURCHASED_ITEMS_PREVIEW_SIZE = 3
+
+
 class User(AbstractUser): ...
 
 
+class ShoppingListQuerySet(models.QuerySet):
+    def inbox(self, user):
+        # Filtered and ordered on the (user, -last_interaction) index of the
+        # user's inbox entries; the lists are then read by primary key.
+        return (
+            self.filter(inbox_entries__user=user)
+            .annotate(
+                inbox_last_interaction=models.F("inbox_entries__last_interaction")
+            )
+            .order_by("-inbox_last_interaction")
+        )
+
+    def with_members(self):
+        # The unpurchased items preview is stored on the list itself, see
+        # shopping_list.interactions.touch_shopping_lists().
+        return self.prefetch_related("members")
+
+
 class ShoppingList(models.Model):
     id = models.UUIDField(primary_key=True, editable=False, default=uuid.uuid4)
     name = models.CharField(max_length=200)
     members = models.ManyToManyField(settings.AUTH_USER_MODEL)
     last_interaction = models.DateTimeField(auto_now=True)
+    item_count = models.PositiveIntegerField(default=0, editable=False)
+    unpurchased_item_count = models.PositiveIntegerField(default=0, editable=False)
+    unpurchased_items_preview = models.JSONField(default=list, editable=False)
+
+    objects = ShoppingListQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["-last_interaction"], name="list_last_interaction_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -22,9 +55,141 @@ class ShoppingItem(models.Model):
     id = models.UUIDField(primary_key=True, editable=False, default=uuid.uuid4)
     name = models.CharField(max_length=200)
     purchased = models.BooleanField()
+    # Indexed through item_list_purchased_name_idx, which leads with the list.
     shopping_list = models.ForeignKey(
-        ShoppingList, on_delete=models.CASCADE, related_name="shopping_items"
+        ShoppingList,
+        on_delete=models.CASCADE,
+        related_name="shopping_items",
+        db_index=False,
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["shopping_list", "purchased", "name"],
+                name="item_list_purchased_name_idx",
+            ),
+        ]
+        # Also serves as the partial index on unpurchased items.
+        constraints = [
+            models.UniqueConstraint(
+                fields=["shopping_list", "name"],
+                condition=models.Q(purchased=False),
+                name="unique_unpurchased_item_name",
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        # The stored (shopping_list_id, purchased) is read under a lock, so
+        # that of two concurrent writes only the one that changed the item
+        # counts the change to its shopping list's summary.
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+        with transaction.atomic(using=kwargs.get("using"), savepoint=False):
+            self._stored_state = self.lock_stored_state()
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get("using"), savepoint=False):
+            self._stored_state = self.lock_stored_state()
+            return super().delete(*args, **kwargs)
+
+    def lock_stored_state(self):
+        # None when the item is no longer stored.
+        return (
+            ShoppingItem.objects.select_for_update()
+            .filter(pk=self.pk)
+            .values_list("shopping_list_id", "purchased")
+            .first()
+        )
+
     def __str__(self):
         return self.name
+
+
+class ShoppingListInboxEntry(models.Model):
+    """
+    A user's membership of a shopping list, copied with the list's
+    `last_interaction` so that the user's lists are listed from one index.
+    """
+
+    OWNER = "owner"
+    MEMBER = "member"
+    ROLE_CHOICES = [(OWNER, "Owner"), (MEMBER, "Member")]
+
+    # Indexed through inbox_user_interaction_idx, which leads with it.
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="+",
+        db_index=False,
+    )
+    shopping_list = models.ForeignKey(
+        ShoppingList, on_delete=models.CASCADE, related_name="inbox_entries"
+    )
+    last_interaction = models.DateTimeField()
+    role = models.CharField(max_length=6, choices=ROLE_CHOICES, default=MEMBER)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "-last_interaction", "shopping_list"],
+                name="inbox_user_interaction_idx",
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "shopping_list"], name="unique_inbox_entry"
+            ),
+        ]
+
+
+class ShoppingItemTrigram(models.Model):
+    shopping_item = models.ForeignKey(
+        ShoppingItem, on_delete=models.CASCADE, related_name="trigrams"
+    )
+    shopping_list = models.ForeignKey(
+        ShoppingList, on_delete=models.CASCADE, related_name="+", db_index=False
+    )
+    trigram = models.CharField(max_length=3)
+    # The rank of the item in search results, so that the postings of a
+    # trigram are read best match first.
+    name_length = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["trigram", "shopping_list", "name_length", "shopping_item"],
+                name="item_trigram_rank_idx",
+            ),
+        ]
+
+
+class ShoppingListChange(models.Model):
+    """
+    Append-only log of the rows created, updated or deleted in a shopping list,
+    read by the sync endpoint. The auto-incremented id is the sync token.
+    """
+
+    SHOPPING_LIST = "list"
+    SHOPPING_ITEM = "item"
+    MEMBER = "member"
+    KIND_CHOICES = [
+        (SHOPPING_LIST, "Shopping list"),
+        (SHOPPING_ITEM, "Shopping item"),
+        (MEMBER, "Member"),
+    ]
+
+    # Not foreign keys: the changes have to outlive the rows they describe.
+    shopping_list_id = models.UUIDField()
+    kind = models.CharField(max_length=6, choices=KIND_CHOICES)
+    object_id = models.CharField(max_length=36)
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["shopping_list_id", "id"], name="change_list_idx"),
+            models.Index(fields=["kind", "object_id", "id"], name="change_object_idx"),
+            models.Index(fields=["created_at"], name="change_created_at_idx"),
+        ]
@@ -1,11 +1,229 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 from django.dispatch import receiver
 
-from shopping_list.models import ShoppingItem, ShoppingList
+from shopping_list.events import publish_event, shopping_item_event_data
+from shopping_list.interactions import (
+    item_count_changes,
+    item_state,
+    touch_shopping_lists,
+)
+from shopping_list.membership import invalidate_memberships
+from shopping_list.models import (
+    ShoppingItem,
+    ShoppingList,
+    ShoppingListChange,
+    ShoppingListInboxEntry,
+)
+from shopping_list.search import get_search_backend
+from shopping_list.sync import record_changes
+
+
+def deleted_with_shopping_list(origin):
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return origin_model is ShoppingList
+
+
+def forget_membership_verdicts(pairs):
+    # Again after the commit, in case a concurrent request cached the verdict
+    # it read before the change was visible.
+    invalidate_memberships(pairs)
+    transaction.on_commit(lambda: invalidate_memberships(pairs))
+
+
+@receiver(post_save, sender=ShoppingItem)
+def interaction_with_shopping_list(sender, instance, created, update_fields, **kwargs):
+    state = item_state(instance)
+    stored = getattr(instance, "_stored_state", None)
+    if created:
+        touch_shopping_lists(counts=item_count_changes((None, state)))
+    elif stored is not None:
+        if update_fields is not None and not update_fields & {
+            "shopping_list",
+            "shopping_list_id",
+            "purchased",
+        }:
+            # Neither was saved, whatever their values in memory.
+            state = stored
+        touch_shopping_lists(counts=item_count_changes((stored, state)))
+    else:
+        # Saved without being read first, so what changed is not known.
+        touch_shopping_lists(instance.shopping_list_id, recount=True)
+
+
+@receiver(post_delete, sender=ShoppingItem)
+def shopping_item_removed_from_shopping_list(sender, instance, origin, **kwargs):
+    # Nothing to touch when the items go away with their shopping list.
+    if deleted_with_shopping_list(origin):
+        return
+    # Model.delete() read the stored state under a lock, and it is None when
+    # a concurrent delete came first. Querysets delete the rows they read.
+    stored = getattr(instance, "_stored_state", item_state(instance))
+    touch_shopping_lists(counts=item_count_changes((stored, None)))
+
+
+@receiver(post_save, sender=ShoppingItem)
+def index_shopping_item(sender, instance, created, **kwargs):
+    get_search_backend().index([instance], new=created)
+
+
+@receiver(post_delete, sender=ShoppingItem)
+def remove_shopping_item_from_index(sender, instance, **kwargs):
+    get_search_backend().remove([instance.id])
 
 
 @receiver(post_save, sender=ShoppingItem)
-def interaction_with_shopping_list(sender, instance, **kwargs):
-    ShoppingList.objects.get(id=instance.shopping_list.id).save(
-        update_fields=["last_interaction"]
+def publish_shopping_item_saved(sender, instance, created, **kwargs):
+    publish_event(
+        "item.created" if created else "item.updated",
+        instance.shopping_list_id,
+        item=shopping_item_event_data(instance),
     )
+
+
+@receiver(post_delete, sender=ShoppingItem)
+def publish_shopping_item_deleted(sender, instance, origin, **kwargs):
+    if not deleted_with_shopping_list(origin):
+        publish_event(
+            "item.deleted", instance.shopping_list_id, item={"id": str(instance.id)}
+        )
+
+
+@receiver(post_save, sender=ShoppingList)
+def publish_shopping_list_saved(sender, instance, created, **kwargs):
+    publish_event(
+        "list.created" if created else "list.updated", instance.pk, name=instance.name
+    )
+
+
+@receiver(post_delete, sender=ShoppingList)
+def publish_shopping_list_deleted(sender, instance, **kwargs):
+    publish_event("list.deleted", instance.pk)
+
+
+@receiver(m2m_changed, sender=ShoppingList.members.through)
+def publish_shopping_list_members_changed(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if action in ("post_add", "post_remove") and pk_set and not reverse:
+        publish_event(
+            "members.added" if action == "post_add" else "members.removed",
+            instance.pk,
+            members=sorted(pk_set),
+        )
+
+
+@receiver(post_save, sender=ShoppingItem)
+def record_shopping_item_saved(sender, instance, **kwargs):
+    record_changes(
+        ShoppingListChange.SHOPPING_ITEM, instance.shopping_list_id, [instance.id]
+    )
+
+
+@receiver(post_delete, sender=ShoppingItem)
+def record_shopping_item_deleted(sender, instance, origin, **kwargs):
+    if not deleted_with_shopping_list(origin):
+        record_changes(
+            ShoppingListChange.SHOPPING_ITEM,
+            instance.shopping_list_id,
+            [instance.id],
+            deleted=True,
+        )
+
+
+@receiver(post_save, sender=ShoppingList)
+def record_shopping_list_saved(sender, instance, **kwargs):
+    record_changes(ShoppingListChange.SHOPPING_LIST, instance.pk, [instance.pk])
+
+
+@receiver(pre_delete, sender=ShoppingList)
+def record_shopping_list_deleted(sender, instance, **kwargs):
+    # The memberships are deleted without m2m_changed, and the tombstones are
+    # how former members learn that the list is gone.
+    member_ids = list(
+        instance.members.through.objects.filter(
+            shoppinglist_id=instance.pk
+        ).values_list("user_id", flat=True)
+    )
+    record_changes(ShoppingListChange.MEMBER, instance.pk, member_ids, deleted=True)
+    forget_membership_verdicts([(user_id, instance.pk) for user_id in member_ids])
+    record_changes(
+        ShoppingListChange.SHOPPING_LIST, instance.pk, [instance.pk], deleted=True
+    )
+
+
+@receiver(m2m_changed, sender=ShoppingList.members.through)
+def record_shopping_list_members_changed(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if action in ("post_add", "post_remove") and pk_set and not reverse:
+        record_changes(
+            ShoppingListChange.MEMBER,
+            instance.pk,
+            sorted(pk_set),
+            deleted=action == "post_remove",
+        )
+
+
+@receiver(m2m_changed, sender=ShoppingList.members.through)
+def update_inbox_entries(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "post_add" and pk_set:
+        if reverse:
+            pairs = [(instance.pk, shopping_list_id) for shopping_list_id in pk_set]
+        else:
+            pairs = [(user_id, instance.pk) for user_id in pk_set]
+        last_interactions = dict(
+            ShoppingList.objects.filter(
+                pk__in={shopping_list_id for _, shopping_list_id in pairs}
+            ).values_list("pk", "last_interaction")
+        )
+        ShoppingListInboxEntry.objects.bulk_create(
+            [
+                ShoppingListInboxEntry(
+                    user_id=user_id,
+                    shopping_list_id=shopping_list_id,
+                    last_interaction=last_interactions[shopping_list_id],
+                )
+                for user_id, shopping_list_id in pairs
+            ],
+            ignore_conflicts=True,
+        )
+    elif action == "post_remove" and pk_set:
+        if reverse:
+            entries = {"user": instance, "shopping_list_id__in": pk_set}
+        else:
+            entries = {"user_id__in": pk_set, "shopping_list": instance}
+        ShoppingListInboxEntry.objects.filter(**entries).delete()
+    elif action == "post_clear":
+        # pk_set is not sent for a clear, so everything on this side goes.
+        entries = {"user": instance} if reverse else {"shopping_list": instance}
+        ShoppingListInboxEntry.objects.filter(**entries).delete()
+
+
+@receiver(m2m_changed, sender=ShoppingList.members.through)
+def invalidate_membership_verdicts(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ("post_add", "post_remove") and pk_set:
+        if reverse:
+            pairs = [(instance.pk, shopping_list_id) for shopping_list_id in pk_set]
+        else:
+            pairs = [(user_id, instance.pk) for user_id in pk_set]
+    elif action == "pre_clear":
+        # pk_set is not sent for a clear, so the memberships are read first.
+        memberships = {"user": instance} if reverse else {"shoppinglist": instance}
+        pairs = list(
+            sender.objects.filter(**memberships).values_list(
+                "user_id", "shoppinglist_id"
+            )
+        )
+    else:
+        return
+    forget_membership_verdicts(pairs)
+
+
+@receiver(post_save, sender=ShoppingList)
+def update_inbox_last_interaction(sender, instance, created, **kwargs):
+    if not created:
+        ShoppingListInboxEntry.objects.filter(shopping_list=instance).update(
+            last_interaction=instance.last_interaction
+        )
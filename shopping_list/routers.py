@@ -0,0 +1,148 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.functional import SimpleLazyObject, empty
+
+from contextvars import ContextVar
+import random
+
+
+_routing = ContextVar("shopping_list_routing", default=None)
+
+
+PIN_COOKIE = "primary_pin"
+PIN_SALT = "shopping_list.routers.primary_pin"
+
+
+def _sticky_seconds():
+    return getattr(settings, "SHOPPING_LIST_PRIMARY_STICKY_SECONDS", 5)
+
+
+def _authenticated_user(request):
+    # Only a user that is already loaded: looking it up from the router would
+    # query the database again.
+    user = request.__dict__.get("user")
+    if isinstance(user, SimpleLazyObject):
+        user = None if user._wrapped is empty else user._wrapped
+    if user is None or not user.is_authenticated:
+        return None
+    return user
+
+
+class RoutingState:
+    def __init__(self, request):
+        self.request = request
+        self.wrote = False
+        self.pinned = None
+
+    def reads_from_primary(self):
+        if self.wrote:
+            return True
+        if self.pinned is None:
+            user = _authenticated_user(self.request)
+            if user is None:
+                return False
+            pinned_user_id = self.request.get_signed_cookie(
+                PIN_COOKIE, default=None, salt=PIN_SALT, max_age=_sticky_seconds()
+            )
+            self.pinned = pinned_user_id == str(user.pk)
+        return self.pinned
+
+    def pin(self, response):
+        # A signed cookie, so that whichever process serves the client's next
+        # request sees the pin, and it expires without any server state.
+        user = _authenticated_user(self.request)
+        if self.wrote and user is not None and _sticky_seconds():
+            response.set_signed_cookie(
+                PIN_COOKIE,
+                str(user.pk),
+                salt=PIN_SALT,
+                max_age=_sticky_seconds(),
+                httponly=True,
+                samesite="Lax",
+            )
+
+
+class PrimaryReplicaRouter:
+    """
+    Send the reads of the shopping_list models to a replica from
+    SHOPPING_LIST_DATABASE_REPLICAS and their writes to the primary.
+
+    Reads go to the primary inside a transaction, for the rest of a request
+    once it wrote, and for SHOPPING_LIST_PRIMARY_STICKY_SECONDS after a write
+    by the same user from the same client, so users read their own writes
+    despite replication lag. Clients that drop cookies are not pinned.
+    """
+
+    app_label = "shopping_list"
+
+    def replicas(self):
+        return getattr(settings, "SHOPPING_LIST_DATABASE_REPLICAS", [])
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != self.app_label:
+            return None
+
+        replicas = self.replicas()
+        state = _routing.get()
+        if (
+            not replicas
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+            or (state is not None and state.reads_from_primary())
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label != self.app_label:
+            return None
+
+        state = _routing.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *self.replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class PrimaryStickinessMiddleware:
+    """
+    Track the writes of each request for PrimaryReplicaRouter, and pin the
+    client to the primary with a signed cookie after one. Must come after
+    AuthenticationMiddleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        state = RoutingState(request)
+        token = _routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        state.pin(response)
+        return response
+
+    async def __acall__(self, request):
+        state = RoutingState(request)
+        token = _routing.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        state.pin(response)
+        return response
@@ -0,0 +1,240 @@
+from functools import cache
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Q
+from django.utils.module_loading import import_string
+
+import re
+import uuid
+
+
+FTS_TABLE = "shopping_list_shoppingitem_fts"
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def matches_prefixes(name, words):
+    """
+    Tell whether every one of `words` starts a word of `name`.
+    """
+    name_words = tokenize(name)
+    return all(
+        any(name_word.startswith(word) for name_word in name_words) for word in words
+    )
+
+
+def word_trigrams(word, prefix=False):
+    # Padded like pg_trgm. A prefix only gets its leading padding, so its
+    # trigrams are a subset of those of every word it starts.
+    padded = f"  {word}" if prefix else f"  {word} "
+    return {padded[index : index + 3] for index in range(len(padded) - 2)}
+
+
+class BaseSearchBackend:
+    def index(self, shopping_items, new=False):
+        raise NotImplementedError
+
+    def remove(self, shopping_item_ids):
+        raise NotImplementedError
+
+    def rebuild(self):
+        raise NotImplementedError
+
+    def search(self, query, shopping_list_ids, limit):
+        """
+        Return the ids of the items of `shopping_list_ids` matching every word
+        of `query` as a prefix, the best `limit` of them first.
+        """
+        raise NotImplementedError
+
+
+class SQLiteFTS5SearchBackend(BaseSearchBackend):
+    """
+    Index item names in an FTS5 table, ranked with bm25.
+
+    `item_id` is an indexed column so that an item's row can be found by MATCH
+    when it is updated or removed.
+    """
+
+    @staticmethod
+    @cache
+    def is_available():
+        return connection.vendor == "sqlite" and FTS_TABLE in (
+            connection.introspection.table_names()
+        )
+
+    def index(self, shopping_items, new=False):
+        shopping_items = list(shopping_items)
+        if not shopping_items:
+            return
+
+        if not new:
+            self.remove([shopping_item.id for shopping_item in shopping_items])
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (name, item_id, shopping_list_id) "
+                "VALUES (%s, %s, %s)",
+                [
+                    (
+                        shopping_item.name,
+                        uuid.UUID(str(shopping_item.id)).hex,
+                        uuid.UUID(str(shopping_item.shopping_list_id)).hex,
+                    )
+                    for shopping_item in shopping_items
+                ],
+            )
+
+    def remove(self, shopping_item_ids):
+        if not shopping_item_ids:
+            return
+
+        item_ids = " OR ".join(
+            f'"{uuid.UUID(str(item_id)).hex}"' for item_id in shopping_item_ids
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+                [f"item_id : ({item_ids})"],
+            )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (name, item_id, shopping_list_id) "
+                "SELECT name, id, shopping_list_id FROM shopping_list_shoppingitem"
+            )
+
+    def search(self, query, shopping_list_ids, limit):
+        words = tokenize(query)
+        shopping_list_ids = [
+            uuid.UUID(str(shopping_list_id)).hex
+            for shopping_list_id in shopping_list_ids
+        ]
+        if not words or not shopping_list_ids:
+            return []
+
+        match = "name : ({})".format(" AND ".join(f'"{word}"*' for word in words))
+        placeholders = ", ".join(["%s"] * len(shopping_list_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT item_id FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s AND shopping_list_id IN ({placeholders}) "
+                f"ORDER BY bm25({FTS_TABLE}, 1.0, 0.0) LIMIT %s",
+                [match, *shopping_list_ids, limit],
+            )
+            return [uuid.UUID(item_id) for (item_id,) in cursor.fetchall()]
+
+
+class TrigramSearchBackend(BaseSearchBackend):
+    """
+    Portable inverted index of the padded trigrams of every word of an item's
+    name, stored in ShoppingItemTrigram.
+    """
+
+    def index(self, shopping_items, new=False):
+        from shopping_list.models import ShoppingItemTrigram
+
+        shopping_items = list(shopping_items)
+        if not shopping_items:
+            return
+
+        if not new:
+            self.remove([shopping_item.id for shopping_item in shopping_items])
+        ShoppingItemTrigram.objects.bulk_create(
+            [
+                ShoppingItemTrigram(
+                    shopping_item_id=shopping_item.id,
+                    shopping_list_id=shopping_item.shopping_list_id,
+                    trigram=trigram,
+                    name_length=len(shopping_item.name),
+                )
+                for shopping_item in shopping_items
+                for trigram in set().union(
+                    *map(word_trigrams, tokenize(shopping_item.name))
+                )
+            ]
+        )
+
+    def remove(self, shopping_item_ids):
+        from shopping_list.models import ShoppingItemTrigram
+
+        ShoppingItemTrigram.objects.filter(
+            shopping_item_id__in=shopping_item_ids
+        ).delete()
+
+    def rebuild(self):
+        from shopping_list.models import ShoppingItem, ShoppingItemTrigram
+
+        ShoppingItemTrigram.objects.all().delete()
+        self.index(ShoppingItem.objects.iterator(chunk_size=2000), new=True)
+
+    def search(self, query, shopping_list_ids, limit):
+        from shopping_list.models import ShoppingItem, ShoppingItemTrigram
+
+        words = tokenize(query)
+        trigrams = set().union(*(word_trigrams(word, prefix=True) for word in words))
+        if not trigrams or not shopping_list_ids:
+            return []
+
+        # The items holding the rarest trigram are the candidates.
+        counts = dict(
+            ShoppingItemTrigram.objects.filter(
+                trigram__in=trigrams, shopping_list_id__in=shopping_list_ids
+            )
+            .values_list("trigram")
+            .annotate(Count("id"))
+            .order_by()
+        )
+        if len(counts) < len(trigrams):
+            return []
+        rarest = min(counts, key=counts.get)
+
+        # Read best match first, until `limit` of them match. Trigrams can
+        # match across words and out of order: the names decide.
+        postings = (
+            ShoppingItemTrigram.objects.filter(
+                trigram=rarest, shopping_list_id__in=shopping_list_ids
+            )
+            .order_by("name_length", "shopping_item_id")
+            .values_list("name_length", "shopping_item_id")
+        )
+        matches, after = [], Q()
+        while len(matches) < limit:
+            batch = list(postings.filter(after)[:limit])
+            names = dict(
+                ShoppingItem.objects.filter(
+                    id__in=[item_id for _, item_id in batch]
+                ).values_list("id", "name")
+            )
+            matches += [
+                item_id
+                for _, item_id in batch
+                if item_id in names and matches_prefixes(names[item_id], words)
+            ]
+            if len(batch) < limit:
+                break
+            name_length, item_id = batch[-1]
+            after = Q(name_length__gt=name_length) | Q(
+                name_length=name_length, shopping_item_id__gt=item_id
+            )
+        return matches[:limit]
+
+
+@cache
+def _load_search_backend(path):
+    return import_string(path)()
+
+
+def get_search_backend():
+    path = getattr(settings, "SHOPPING_ITEM_SEARCH_BACKEND", None)
+    if path is None:
+        if SQLiteFTS5SearchBackend.is_available():
+            path = "shopping_list.search.SQLiteFTS5SearchBackend"
+        else:
+            path = "shopping_list.search.TrigramSearchBackend"
+    return _load_search_backend(path)
@@ -0,0 +1,208 @@
+from django.conf import settings
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+
+from shopping_list.membership import shopping_list_ids
+from shopping_list.models import ShoppingItem, ShoppingList, ShoppingListChange
+
+from datetime import timedelta
+from typing import NamedTuple
+import uuid
+
+
+class SyncToken(NamedTuple):
+    """
+    The id of the last change a client got, and while a snapshot is sent in
+    pages, the id of the last shopping item of the previous page.
+    """
+
+    change_id: int
+    snapshot_after: uuid.UUID = None
+
+    @classmethod
+    def parse(cls, value):
+        change_id, _, snapshot_after = value.partition(":")
+        if not change_id.isdigit():
+            raise ValueError(value)
+        return cls(
+            int(change_id), uuid.UUID(snapshot_after) if snapshot_after else None
+        )
+
+    def __str__(self):
+        if self.snapshot_after is None:
+            return str(self.change_id)
+        return f"{self.change_id}:{self.snapshot_after}"
+
+
+def record_changes(kind, shopping_list_id, object_ids, deleted=False):
+    ShoppingListChange.objects.bulk_create(
+        [
+            ShoppingListChange(
+                shopping_list_id=shopping_list_id,
+                kind=kind,
+                object_id=str(object_id),
+                deleted=deleted,
+            )
+            for object_id in object_ids
+        ]
+    )
+
+
+def latest_sync_token():
+    """
+    The id of the latest change that no change still being written precedes.
+
+    Ids are taken when a change is written but only show once its transaction
+    commits, so a missing id among the recent changes may still appear: the
+    token stops before it. A gap followed by changes older than
+    SHOPPING_LIST_SYNC_SETTLE_SECONDS is taken for a rolled back transaction.
+    """
+    changes = ShoppingListChange.objects
+    horizon = timezone.now() - timedelta(
+        seconds=getattr(settings, "SHOPPING_LIST_SYNC_SETTLE_SECONDS", 30)
+    )
+    first_recent = changes.filter(created_at__gte=horizon).aggregate(id=Min("id"))
+    if first_recent["id"] is None:
+        return changes.aggregate(id=Max("id"))["id"] or 0
+
+    token = changes.filter(id__lt=first_recent["id"]).aggregate(id=Max("id"))["id"]
+    token = token or 0
+    for change_id in (
+        changes.filter(id__gte=first_recent["id"])
+        .order_by("id")
+        .values_list("id", flat=True)
+    ):
+        if change_id != token + 1:
+            break
+        token = change_id
+    return token
+
+
+def is_expired(sync_token):
+    # Changes up to the token may have been pruned. Every token handed out is
+    # the id of a change, so one older than the oldest kept change is gone.
+    # The newest change is never pruned, so an empty log has lost nothing.
+    if not sync_token:
+        return False
+    oldest = ShoppingListChange.objects.aggregate(oldest=Min("id"))["oldest"]
+    return oldest is not None and sync_token < oldest
+
+
+class Changes:
+    def __init__(self, sync_token):
+        self.sync_token = sync_token
+        self.has_more = False
+        self.shopping_list_ids = set()
+        self.deleted_shopping_list_ids = set()
+        self.shopping_item_ids = set()
+        self.deleted_shopping_item_ids = set()
+        self.members = {}
+
+    def snapshot(self, shopping_list_ids):
+        shopping_list_ids = set(shopping_list_ids)
+        self.shopping_list_ids |= shopping_list_ids
+        self.shopping_item_ids |= set(
+            ShoppingItem.objects.filter(
+                shopping_list_id__in=shopping_list_ids
+            ).values_list("id", flat=True)
+        )
+        for shopping_list_id, user_id in ShoppingList.members.through.objects.filter(
+            shoppinglist_id__in=shopping_list_ids
+        ).values_list("shoppinglist_id", "user_id"):
+            self.members[shopping_list_id, user_id] = True
+
+    def shopping_lists(self):
+        return ShoppingList.objects.filter(pk__in=self.shopping_list_ids).order_by("id")
+
+    def shopping_items(self):
+        return ShoppingItem.objects.filter(pk__in=self.shopping_item_ids).order_by("id")
+
+
+def get_snapshot(user, sync_token=None, limit=500):
+    """
+    Every row of the shopping lists of `user`, with at most `limit` items per
+    page. Lists and members come with the first page; the changes made while
+    the pages are read come with the next sync.
+    """
+    if sync_token is None or sync_token.snapshot_after is None:
+        changes = Changes(SyncToken(latest_sync_token()))
+        visible_shopping_list_ids = set(shopping_list_ids(user))
+        changes.shopping_list_ids |= visible_shopping_list_ids
+        changes.members = dict.fromkeys(
+            ShoppingList.members.through.objects.filter(
+                shoppinglist_id__in=visible_shopping_list_ids
+            ).values_list("shoppinglist_id", "user_id"),
+            True,
+        )
+        items = ShoppingItem.objects.filter(
+            shopping_list_id__in=visible_shopping_list_ids
+        )
+    else:
+        changes = Changes(SyncToken(sync_token.change_id))
+        items = ShoppingItem.objects.filter(
+            shopping_list_id__in=shopping_list_ids(user),
+            id__gt=sync_token.snapshot_after,
+        )
+
+    item_ids = list(items.order_by("id").values_list("id", flat=True)[: limit + 1])
+    changes.has_more = len(item_ids) > limit
+    item_ids = item_ids[:limit]
+    changes.shopping_item_ids |= set(item_ids)
+    if changes.has_more:
+        changes.sync_token = SyncToken(changes.sync_token.change_id, item_ids[-1])
+    return changes
+
+
+def get_changes(user, sync_token=None, limit=500):
+    """
+    Collect what changed since `sync_token` in the shopping lists of `user`.
+
+    Without a token the rows are sent as a snapshot, see get_snapshot(). For
+    a list the user joined since the token, every row of the list is returned.
+    Rows are read in their current state, so a row changed several times is
+    sent once, and a row deleted since its change only as a tombstone.
+    """
+    if sync_token is None or not sync_token.change_id or sync_token.snapshot_after:
+        return get_snapshot(user, sync_token, limit)
+
+    visible_shopping_list_ids = set(shopping_list_ids(user))
+    log = list(
+        ShoppingListChange.objects.filter(
+            Q(shopping_list_id__in=visible_shopping_list_ids)
+            | Q(kind=ShoppingListChange.MEMBER, object_id=str(user.pk)),
+            id__gt=sync_token.change_id,
+            id__lte=latest_sync_token(),
+        ).order_by("id")[: limit + 1]
+    )
+    changes = Changes(sync_token)
+    changes.has_more = len(log) > limit
+    log = log[:limit]
+    if log:
+        changes.sync_token = SyncToken(log[-1].id)
+
+    latest = {}
+    for change in log:
+        latest[change.kind, change.shopping_list_id, change.object_id] = change
+
+    joined_shopping_list_ids = set()
+    for (kind, shopping_list_id, object_id), change in latest.items():
+        own_membership = kind == ShoppingListChange.MEMBER and object_id == str(user.pk)
+        if shopping_list_id not in visible_shopping_list_ids:
+            # Left or deleted since: only the user's own tombstone matters.
+            if own_membership and change.deleted:
+                changes.deleted_shopping_list_ids.add(shopping_list_id)
+            continue
+
+        if own_membership and not change.deleted:
+            joined_shopping_list_ids.add(shopping_list_id)
+        elif kind == ShoppingListChange.MEMBER:
+            changes.members[shopping_list_id, int(object_id)] = not change.deleted
+        elif kind == ShoppingListChange.SHOPPING_ITEM:
+            if change.deleted:
+                changes.deleted_shopping_item_ids.add(object_id)
+            else:
+                changes.shopping_item_ids.add(object_id)
+        changes.shopping_list_ids.add(shopping_list_id)
+
+    changes.snapshot(joined_shopping_list_ids)
+    return changes
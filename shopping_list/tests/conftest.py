@@ -1,8 +1,14 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import clear_url_caches
 from rest_framework.test import APIClient
 
+from shopping_list.interactions import update_item_summaries
 from shopping_list.models import ShoppingList, ShoppingItem
+from shopping_list.search import get_search_backend
 
+import importlib
 import pytest
 
 User = get_user_model()
@@ -47,3 +53,49 @@ def create_shopping_list():
         return shopping_list
 
     return _create_shopping_list
+
+
+@pytest.fixture(scope="session")
+def create_users():
+    # Without passwords: hashing one per user would dominate the seeding.
+    def _create_users(count, prefix="user"):
+        return User.objects.bulk_create(
+            User(username=f"{prefix}{index}", email=f"{prefix}{index}@user.com")
+            for index in range(count)
+        )
+
+    return _create_users
+
+
+@pytest.fixture(scope="session")
+def create_shopping_items():
+    # Bulk created, so the summaries and the search index are updated here
+    # instead of by the post_save receivers.
+    def _create_shopping_items(shopping_list, count, purchased_every=4):
+        shopping_items = ShoppingItem.objects.bulk_create(
+            ShoppingItem(
+                name=f"item {index:05}",
+                purchased=index % purchased_every == 0,
+                shopping_list=shopping_list,
+            )
+            for index in range(count)
+        )
+        update_item_summaries([shopping_list.pk], touch=False)
+        get_search_backend().index(shopping_items, new=True)
+        return shopping_items
+
+    return _create_shopping_items
+
+
+def reload_urlconf():
+    for urlconf in ["shopping_list.urls", settings.ROOT_URLCONF]:
+        importlib.reload(importlib.import_module(urlconf))
+    clear_url_caches()
+
+
+@pytest.fixture
+def async_views():
+    with override_settings(SHOPPING_LIST_ASYNC_VIEWS=True):
+        reload_urlconf()
+        yield
+    reload_urlconf()
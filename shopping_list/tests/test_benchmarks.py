@@ -0,0 +1,343 @@
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from rest_framework.test import APIClient
+
+from pathlib import Path
+from statistics import median, quantiles
+from time import perf_counter
+from types import SimpleNamespace
+from typing import Callable, NamedTuple
+from unittest import mock
+import json
+import os
+import pytest
+
+from shopping_list import urls
+from shopping_list.models import ShoppingItem
+
+
+BASELINES = Path(__file__).with_name("benchmark_baselines.json")
+
+ITERATIONS = 20
+WARMUP_ITERATIONS = 2
+
+# Latencies are compared as multiples of the median p50 of all routes in the
+# same run, so the baselines hold on any machine; milliseconds are only
+# printed. A multiple may grow by this fraction of its baseline, and by at
+# least the given multiple, before the suite fails; query counts may not
+# grow at all.
+TOLERANCE = float(os.environ.get("BENCHMARK_TOLERANCE", 0.5))
+MIN_REGRESSION = float(os.environ.get("BENCHMARK_MIN_REGRESSION", 1))
+
+# Routes that cannot be timed as request/response round trips.
+SKIPPED_ROUTES = {
+    "change-feed": "streams until the client disconnects",
+}
+
+
+class Route(NamedTuple):
+    name: str
+    method: str
+    url: Callable
+    data: Callable = None
+    authenticated: bool = True
+    variant: str = ""
+
+    @property
+    def key(self):
+        key = f"{self.method.upper()} {self.name}"
+        return f"{key} ({self.variant})" if self.variant else key
+
+
+def route_url(name, *args):
+    return lambda seed, index: reverse(name, args=[arg(seed) for arg in args])
+
+
+def big_list(seed):
+    return seed.big_list.pk
+
+
+def first_item(seed):
+    return seed.items[0].pk
+
+
+def fresh_shopping_list(seed, index):
+    return reverse("shopping-list-detail", args=[seed.fresh_lists[index].pk])
+
+
+def fresh_shopping_item(seed, index):
+    return reverse(
+        "shopping-item-detail", args=[seed.big_list.pk, seed.fresh_items[index].pk]
+    )
+
+
+def member_ids(seed, index):
+    return {"members": [member.pk for member in seed.members[:5]]}
+
+
+ROUTES = [
+    Route(
+        "api-token-auth",
+        "post",
+        route_url("api-token-auth"),
+        lambda seed, index: {"username": "normalUser", "password": "something"},
+        authenticated=False,
+    ),
+    Route("all-shopping-lists", "get", route_url("all-shopping-lists")),
+    Route(
+        "all-shopping-lists",
+        "post",
+        route_url("all-shopping-lists"),
+        lambda seed, index: {"name": f"new list {index}"},
+    ),
+    Route("shopping-list-detail", "get", route_url("shopping-list-detail", big_list)),
+    Route(
+        "shopping-list-detail",
+        "patch",
+        route_url("shopping-list-detail", big_list),
+        lambda seed, index: {"name": f"renamed {index}"},
+    ),
+    Route("shopping-list-detail", "delete", fresh_shopping_list),
+    Route(
+        "shopping-list-add-members",
+        "put",
+        route_url("shopping-list-add-members", big_list),
+        member_ids,
+    ),
+    Route(
+        "shopping-list-remove-members",
+        "put",
+        route_url("shopping-list-remove-members", big_list),
+        member_ids,
+    ),
+    Route(
+        "list-add-shopping-item", "get", route_url("list-add-shopping-item", big_list)
+    ),
+    Route(
+        "list-add-shopping-item",
+        "post",
+        route_url("list-add-shopping-item", big_list),
+        lambda seed, index: {"name": f"new item {index}", "purchased": False},
+    ),
+    Route(
+        "bulk-shopping-items",
+        "post",
+        route_url("bulk-shopping-items", big_list),
+        lambda seed, index: {
+            "create": [
+                {"name": f"bulk item {index}-{n}", "purchased": False}
+                for n in range(10)
+            ],
+            "update": [
+                {"id": str(item.pk), "purchased": index % 2 == 0}
+                for item in seed.items[:10]
+            ],
+        },
+    ),
+    Route(
+        "shopping-item-detail",
+        "get",
+        route_url("shopping-item-detail", big_list, first_item),
+    ),
+    Route(
+        "shopping-item-detail",
+        "patch",
+        route_url("shopping-item-detail", big_list, first_item),
+        lambda seed, index: {"purchased": index % 2 == 0},
+    ),
+    Route("shopping-item-detail", "delete", fresh_shopping_item),
+    Route(
+        "search_shopping-items",
+        "get",
+        lambda seed, index: reverse("search_shopping-items") + "?search=item 01",
+    ),
+    Route("sync", "get", route_url("sync")),
+    Route("export", "get", route_url("export")),
+    Route(
+        "export",
+        "get",
+        lambda seed, index: reverse("export") + "?export_format=csv",
+        variant="csv",
+    ),
+    Route("metrics", "get", route_url("metrics")),
+    Route("schema", "get", route_url("schema")),
+    Route("swagger-ui", "get", route_url("swagger-ui")),
+]
+
+
+@pytest.fixture
+def seed(
+    create_user,
+    create_users,
+    create_shopping_list,
+    create_shopping_items,
+):
+    # One user in many lists, one of them with thousands of items and many
+    # members, plus the rows that DELETE requests use up.
+    user = create_user()
+    user.is_staff = True  # for /metrics
+    user.save()
+    members = create_users(50, prefix="member")
+    for index in range(50):
+        shopping_list = create_shopping_list(f"list {index:02}", user)
+        create_shopping_items(shopping_list, 20)
+
+    big_list = create_shopping_list("big list", user)
+    big_list.members.add(*members[5:])
+    items = create_shopping_items(big_list, 5000)
+
+    iterations = WARMUP_ITERATIONS + ITERATIONS + 1
+    return SimpleNamespace(
+        user=user,
+        members=members,
+        big_list=big_list,
+        items=items,
+        fresh_lists=[
+            create_shopping_list(f"doomed {index}", user) for index in range(iterations)
+        ],
+        fresh_items=ShoppingItem.objects.bulk_create(
+            ShoppingItem(
+                name=f"doomed {index}", purchased=False, shopping_list=big_list
+            )
+            for index in range(iterations)
+        ),
+    )
+
+
+def measure(client, route, seed):
+    def request(index):
+        response = getattr(client, route.method)(
+            route.url(seed, index),
+            route.data(seed, index) if route.data else None,
+            format="json",
+        )
+        if response.streaming:
+            b"".join(response.streaming_content)
+        return response
+
+    for index in range(WARMUP_ITERATIONS):
+        assert request(index).status_code < 400
+
+    latencies = []
+    started = perf_counter()
+    for index in range(WARMUP_ITERATIONS, WARMUP_ITERATIONS + ITERATIONS):
+        request_started = perf_counter()
+        response = request(index)
+        latencies.append(perf_counter() - request_started)
+        assert response.status_code < 400, (route, response.status_code)
+    elapsed = perf_counter() - started
+
+    with CaptureQueriesContext(connection) as queries:
+        request(WARMUP_ITERATIONS + ITERATIONS)
+
+    percentiles = quantiles(latencies, n=100)
+    return {
+        "requests_per_second": round(ITERATIONS / elapsed, 1),
+        "p50_ms": round(median(latencies) * 1000, 2),
+        "p95_ms": round(percentiles[94] * 1000, 2),
+        "p99_ms": round(percentiles[98] * 1000, 2),
+        "queries": len(queries),
+    }
+
+
+def relative_latencies(results):
+    reference = median(result["p50_ms"] for result in results.values())
+    return {
+        key: {
+            "queries": result["queries"],
+            "relative_p50": round(result["p50_ms"] / reference, 2),
+        }
+        for key, result in results.items()
+    }
+
+
+def regressions(results, baselines):
+    found = []
+    for key, result in relative_latencies(results).items():
+        baseline = baselines.get(key)
+        if baseline is None:
+            continue
+        if result["queries"] > baseline["queries"]:
+            found.append(
+                f"{key}: {result['queries']} queries, baseline {baseline['queries']}"
+            )
+        allowed = max(baseline["relative_p50"] * TOLERANCE, MIN_REGRESSION)
+        if result["relative_p50"] > baseline["relative_p50"] + allowed:
+            found.append(
+                f"{key}: p50 {result['relative_p50']}x the median route, "
+                f"baseline {baseline['relative_p50']}x"
+            )
+    return found
+
+
+def test_every_route_is_benchmarked():
+    names = {
+        pattern.name
+        for pattern in urls.urlpatterns
+        if isinstance(pattern, URLPattern) and pattern.name
+    }
+    assert names == {route.name for route in ROUTES} | set(SKIPPED_ROUTES)
+
+
+def test_regressions_ignore_machine_speed():
+    results = {
+        f"GET route {index}": {"p50_ms": p50_ms, "queries": 2}
+        for index, p50_ms in enumerate([2, 5, 8, 40])
+    }
+    baselines = relative_latencies(results)
+    slower_machine = {
+        key: {**result, "p50_ms": result["p50_ms"] * 3}
+        for key, result in results.items()
+    }
+    slower_route = {**results, "GET route 3": {"p50_ms": 100, "queries": 3}}
+
+    assert regressions(slower_machine, baselines) == []
+    assert regressions(slower_route, baselines) == [
+        "GET route 3: 3 queries, baseline 2",
+        "GET route 3: p50 15.38x the median route, baseline 6.15x",
+    ]
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+def test_endpoints_against_baselines(seed, capsys):
+    """
+    Time every route against the seeded data and compare the query counts
+    and relative latencies with benchmark_baselines.json. Set
+    BENCHMARK_UPDATE_BASELINES=1 to rewrite the baselines instead.
+    """
+    client = APIClient()
+    client.force_login(seed.user)
+
+    results = {}
+    # Neither the throttles nor the response cache should be measured.
+    with (
+        mock.patch(
+            "shopping_list.api.throttling.FixedWindowRateThrottle.allow_request",
+            return_value=True,
+        ),
+        override_settings(SHOPPING_LIST_RESPONSE_CACHE_TIMEOUT=0),
+    ):
+        for route in ROUTES:
+            results[route.key] = measure(
+                client if route.authenticated else APIClient(), route, seed
+            )
+
+    with capsys.disabled():
+        print(f"\n{ITERATIONS} requests per route")
+        for key, result in results.items():
+            print(
+                f"{key:>37}: {result['requests_per_second']:7.1f} req/s  "
+                f"p50 {result['p50_ms']:7.2f}  p95 {result['p95_ms']:7.2f}  "
+                f"p99 {result['p99_ms']:7.2f} ms  {result['queries']:3} queries"
+            )
+
+    if os.environ.get("BENCHMARK_UPDATE_BASELINES") == "1" or not BASELINES.exists():
+        BASELINES.write_text(
+            json.dumps(relative_latencies(results), indent=2, sort_keys=True) + "\n"
+        )
+        return
+
+    assert regressions(results, json.loads(BASELINES.read_text())) == []
@@ -0,0 +1,224 @@
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.test import AsyncClient, override_settings
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+
+from statistics import quantiles
+from time import perf_counter
+from unittest import mock
+import asyncio
+import json
+import os
+import pytest
+import subprocess
+import sys
+import tracemalloc
+
+from shopping_list.api.compiled import compile_serializer
+from shopping_list.api.serializers import ShoppingItemSerializer, ShoppingListSerializer
+from shopping_list.models import ShoppingItem, ShoppingList
+from shopping_list.tests.conftest import reload_urlconf
+
+
+CONCURRENT_CLIENTS = 20
+REQUESTS_PER_CLIENT = 25
+
+
+async def run_clients(client, urls):
+    latencies = []
+
+    async def run_client():
+        for index in range(REQUESTS_PER_CLIENT):
+            started = perf_counter()
+            response = await client.get(urls[index % len(urls)])
+            latencies.append(perf_counter() - started)
+            assert response.status_code == 200
+
+    started = perf_counter()
+    await asyncio.gather(*[run_client() for _ in range(CONCURRENT_CLIENTS)])
+    elapsed = perf_counter() - started
+
+    return len(latencies) / elapsed, quantiles(latencies, n=100)[98] * 1000
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+def test_async_views_under_concurrent_clients(
+    create_user, create_shopping_list, capsys
+):
+    user = create_user()
+    client = AsyncClient()
+    client.force_login(user)
+    shopping_lists = [create_shopping_list(f"list {i}", user) for i in range(10)]
+    for shopping_list in shopping_lists:
+        ShoppingItem.objects.bulk_create(
+            ShoppingItem(name=f"item {i}", purchased=False, shopping_list=shopping_list)
+            for i in range(20)
+        )
+
+    results = {}
+    # Neither the throttles nor the response cache should be measured.
+    with (
+        mock.patch(
+            "shopping_list.api.throttling.FixedWindowRateThrottle.allow_request",
+            return_value=True,
+        ),
+        override_settings(SHOPPING_LIST_RESPONSE_CACHE_TIMEOUT=0),
+    ):
+        for async_views in (False, True):
+            with override_settings(SHOPPING_LIST_ASYNC_VIEWS=async_views):
+                reload_urlconf()
+                urls = [
+                    reverse("all-shopping-lists"),
+                    reverse("search_shopping-items") + "?search=item",
+                    *(
+                        reverse("list-add-shopping-item", args=[shopping_list.pk])
+                        for shopping_list in shopping_lists
+                    ),
+                ]
+                results["async" if async_views else "sync"] = async_to_sync(
+                    run_clients
+                )(client, urls)
+    reload_urlconf()
+
+    with capsys.disabled():
+        print(f"\n{CONCURRENT_CLIENTS} clients x {REQUESTS_PER_CLIENT} requests")
+        for name, (requests_per_second, p99) in results.items():
+            print(f"{name:>5}: {requests_per_second:8.1f} req/s  p99 {p99:7.1f} ms")
+
+
+@pytest.mark.benchmark
+def test_item_writes_with_database_profiles(tmp_path, capsys):
+    results = {}
+    for profile in ("development", "production"):
+        env = {
+            **os.environ,
+            "DJANGO_DATABASE_ENGINE": "sqlite",
+            "DJANGO_DATABASE_PROFILE": profile,
+            "DJANGO_DATABASE_NAME": str(tmp_path / f"{profile}.sqlite3"),
+        }
+        manage = [sys.executable, str(settings.BASE_DIR / "manage.py")]
+        subprocess.run([*manage, "migrate", "-v", "0"], env=env, check=True)
+        output = subprocess.run(
+            [*manage, "benchmark_item_writes", "--workers", "8", "--items", "100"],
+            env=env,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        results[profile] = json.loads(output)
+
+    with capsys.disabled():
+        print("\n8 workers x 100 items on SQLite")
+        for profile, result in results.items():
+            print(
+                f"{profile:>11}: {result['items_per_second']:8.1f} items/s  "
+                f"{result['errors']} errors"
+            )
+
+    assert results["production"]["errors"] == 0
+
+
+def objects_per_second(serialize, count, rounds=5):
+    best = min(timed(serialize) for _ in range(rounds))
+    return count / best
+
+
+def timed(function):
+    started = perf_counter()
+    function()
+    return perf_counter() - started
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+def test_compiled_serializers(
+    create_user, create_users, create_shopping_list, create_shopping_items, capsys
+):
+    user = create_user()
+    members = create_users(20, prefix="member")
+    for index in range(200):
+        create_shopping_list(f"list {index}", user).members.add(*members)
+    create_shopping_items(ShoppingList.objects.first(), 5000)
+
+    items = ShoppingItem.objects.order_by("id")
+    item_rows = list(compile_serializer(ShoppingItemSerializer).values(items))
+    item_instances = list(items)
+    shopping_lists = list(ShoppingList.objects.order_by("id").with_members())
+
+    cases = {
+        "items": (ShoppingItemSerializer, item_instances, item_rows),
+        "shopping lists": (ShoppingListSerializer, shopping_lists, shopping_lists),
+    }
+    render = JSONRenderer().render
+    results = {}
+    for name, (serializer_class, instances, rows) in cases.items():
+        plan = compile_serializer(serializer_class)
+        assert render(plan.data(rows, many=True)) == render(
+            serializer_class(instances, many=True).data
+        )
+        results[name] = (
+            objects_per_second(
+                lambda: serializer_class(instances, many=True).data, len(instances)
+            ),
+            objects_per_second(lambda: plan.data(rows, many=True), len(rows)),
+        )
+
+    with capsys.disabled():
+        print("\nobjects/s       DRF  compiled")
+        for name, (drf, compiled) in results.items():
+            print(f"{name:>14}: {drf:9.0f} {compiled:9.0f}  x{compiled / drf:.1f}")
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+@pytest.mark.parametrize("server", ["wsgi", "asgi"])
+def test_streamed_items_memory(
+    server,
+    create_user,
+    create_authenticated_client,
+    create_shopping_list,
+    create_shopping_items,
+    capsys,
+):
+    user = create_user()
+    client = create_authenticated_client(user)
+
+    async def aread(url):
+        async_client = AsyncClient()
+        await async_client.aforce_login(user)
+        response = await async_client.get(url)
+        # ASGIHandler reads a sync streaming_content into memory before sending.
+        assert response.is_async
+        return sum([len(chunk) async for chunk in response.streaming_content])
+
+    def read(url):
+        if server == "asgi":
+            return async_to_sync(aread)(url)
+        return sum(len(chunk) for chunk in client.get(url))
+
+    results = {}
+    with mock.patch(
+        "shopping_list.api.throttling.FixedWindowRateThrottle.allow_request",
+        return_value=True,
+    ):
+        for count in (5000, 50000):
+            shopping_list = create_shopping_list(f"{count} items", user)
+            create_shopping_items(shopping_list, count)
+            url = reverse("list-add-shopping-item", args=[shopping_list.pk])
+
+            tracemalloc.start()
+            size = read(url + "?stream=1")
+            results[count] = size, tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    with capsys.disabled():
+        print(f"\n?stream=1 of a shopping list's items over {server.upper()}")
+        for count, (size, peak) in results.items():
+            print(
+                f"{count:>6} items: {size / 2**20:6.1f} MiB body  "
+                f"{peak / 2**20:6.1f} MiB peak memory"
+            )
+
+    assert results[50000][1] < 2 * results[5000][1]
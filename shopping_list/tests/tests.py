@@ -1,13 +1,59 @@
+from asgiref.sync import async_to_sync
 from django.contrib.auth import get_user_model
-from django.urls import reverse
+from django.contrib.auth.models import update_last_login
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
 from rest_framework import status
-from rest_framework.test import APIClient
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
 
 from datetime import datetime, timedelta
 from unittest import mock
+import asyncio
+import csv
+import io
+import json
 import pytest
-
-from shopping_list.models import ShoppingList, ShoppingItem
+import re
+import threading
+import time
+import uuid
+
+from shopping_list.api.authentication import (
+    CachedTokenAuthentication,
+    _cache_key as _token_cache_key,
+)
+from shopping_list.api.throttling import (
+    DefaultRateThrottle,
+    FixedWindowRateThrottle,
+)
+from shopping_list.api.change_feed import is_visible, stream_events
+from shopping_list.api.compiled import compile_serializer
+from shopping_list.api.serializers import (
+    ShoppingItemSerializer,
+    ShoppingListSerializer,
+    SyncShoppingItemSerializer,
+)
+from shopping_list.checks import check_shared_caches
+from shopping_list.events import InProcessEventBroker
+from shopping_list.instrumentation import metrics
+from shopping_list.interactions import coalesce_touches
+from shopping_list.models import (
+    ShoppingItem,
+    ShoppingList,
+    ShoppingListChange,
+    ShoppingListInboxEntry,
+)
+from shopping_list.routers import PrimaryReplicaRouter, PrimaryStickinessMiddleware
 
 
 User = get_user_model()
@@ -336,6 +382,39 @@ class TestShoppingList:
         assert response.data["results"][1]["name"] == "recent"
         assert response.data["results"][0]["name"] == "older"
 
+    def test_list_all_shopping_lists_query_count_does_not_grow_with_lists(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        another_member = User.objects.create_user(
+            "another", "another@user.com", "something"
+        )
+        url = reverse("all-shopping-lists")
+
+        def create_populated_shopping_list(name):
+            shopping_list = create_shopping_list(name, user)
+            shopping_list.members.add(another_member)
+            for index in range(4):
+                ShoppingItem.objects.create(
+                    name=f"item-{index}", purchased=False, shopping_list=shopping_list
+                )
+
+        create_populated_shopping_list("first")
+        with CaptureQueriesContext(connection) as one_list_queries:
+            client.get(url)
+
+        for index in range(5):
+            create_populated_shopping_list(f"list-{index}")
+        with CaptureQueriesContext(connection) as many_lists_queries:
+            response = client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(many_lists_queries) == len(one_list_queries)
+        for shopping_list in response.data["results"]:
+            assert len(shopping_list["members"]) == 2
+            assert len(shopping_list["unpurchased_items"]) == 3
+
     def test_call_with_token_authentication(self):
         username = "admin"
         password = "something"
@@ -437,6 +516,70 @@ class TestShoppingList:
         assert another_member.id not in response.data["members"]
         assert third_member.id not in response.data["members"]
 
+    def test_removed_member_loses_access_to_shopping_list(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        shopping_list = create_shopping_list("my list", user)
+        removed_member = User.objects.create_user(
+            username="removed_member", password="whocares"
+        )
+        shopping_list.members.add(removed_member)
+
+        detail_url = reverse("shopping-list-detail", args=[shopping_list.pk])
+        removed_member_client = create_authenticated_client(removed_member)
+        response = removed_member_client.get(detail_url)
+        assert response.status_code == status.HTTP_200_OK
+
+        url = reverse("shopping-list-remove-members", args=[shopping_list.pk])
+        create_authenticated_client(user).put(
+            url, {"members": [removed_member.id]}, format="json"
+        )
+        response = removed_member_client.get(detail_url)
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_member_removed_directly_loses_access_to_shopping_list(
+        self, settings, create_user, create_authenticated_client, create_shopping_list
+    ):
+        settings.SHOPPING_LIST_MEMBERSHIP_CACHE_TIMEOUT = 60
+        user = create_user()
+        shopping_list = create_shopping_list("my list", user)
+        removed_member = User.objects.create_user(
+            username="removed_member", password="whocares"
+        )
+        shopping_list.members.add(removed_member)
+
+        detail_url = reverse("shopping-list-detail", args=[shopping_list.pk])
+        removed_member_client = create_authenticated_client(removed_member)
+        response = removed_member_client.get(detail_url)
+        assert response.status_code == status.HTTP_200_OK
+
+        shopping_list.members.remove(removed_member)
+        response = removed_member_client.get(detail_url)
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_member_added_directly_gains_access_to_shopping_list(
+        self, settings, create_user, create_authenticated_client, create_shopping_list
+    ):
+        settings.SHOPPING_LIST_MEMBERSHIP_CACHE_TIMEOUT = 60
+        user = create_user()
+        shopping_list = create_shopping_list("my list", user)
+        new_member = User.objects.create_user(
+            username="new_member", password="whocares"
+        )
+
+        detail_url = reverse("shopping-list-detail", args=[shopping_list.pk])
+        new_member_client = create_authenticated_client(new_member)
+        response = new_member_client.get(detail_url)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+        new_member.shoppinglist_set.add(shopping_list)
+        response = new_member_client.get(detail_url)
+
+        assert response.status_code == status.HTTP_200_OK
+
     def test_remove_members_not_list_member(
         self, create_user, create_authenticated_client, create_shopping_list
     ):
@@ -784,6 +927,29 @@ class TestShoppingItem:
 
         assert response.status_code == status.HTTP_400_BAD_REQUEST
 
+    def test_mark_duplicate_item_unpurchased_returns_400(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        shopping_list = create_shopping_list("abc", user)
+        ShoppingItem.objects.create(
+            name="a", purchased=False, shopping_list=shopping_list
+        )
+        purchased_item = ShoppingItem.objects.create(
+            name="a", purchased=True, shopping_list=shopping_list
+        )
+
+        client = create_authenticated_client(user)
+        url = reverse(
+            "shopping-item-detail",
+            kwargs={"pk": shopping_list.pk, "item_pk": purchased_item.pk},
+        )
+        response = client.patch(url, {"purchased": False}, format="json")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        purchased_item.refresh_from_db()
+        assert purchased_item.purchased is True
+
     def test_search_returns_corresponding_shopping_item(
         self, create_user, create_authenticated_client, create_shopping_item
     ):
@@ -936,3 +1102,2044 @@ class TestShoppingItem:
         assert response.data["results"][1]["name"] == "Dates"
         assert response.data["results"][2]["name"] == "Apples"
         assert response.data["results"][3]["name"] == "Coconut"
+
+    def test_saving_shopping_item_touches_shopping_list_with_one_update(
+        self, create_user, create_shopping_list
+    ):
+        user = create_user()
+        shopping_list = create_shopping_list("new list", user)
+
+        with CaptureQueriesContext(connection) as queries:
+            ShoppingItem.objects.create(
+                name="Apples", purchased=False, shopping_list=shopping_list
+            )
+
+        list_queries = [
+            query["sql"]
+            for query in queries
+            if '"shopping_list_shoppinglist"' in query["sql"]
+        ]
+        assert len(list_queries) == 1
+        assert list_queries[0].startswith("UPDATE")
+
+    def test_coalesced_touches_write_shopping_list_once(
+        self, create_user, create_shopping_list
+    ):
+        user = create_user()
+        shopping_list = create_shopping_list("new list", user)
+        last_interaction = shopping_list.last_interaction
+
+        with CaptureQueriesContext(connection) as queries:
+            with coalesce_touches():
+                for name in ["Apples", "Bananas", "Coconut"]:
+                    ShoppingItem.objects.create(
+                        name=name, purchased=False, shopping_list=shopping_list
+                    )
+
+        list_updates = [
+            query["sql"]
+            for query in queries
+            if query["sql"].startswith('UPDATE "shopping_list_shoppinglist"')
+        ]
+        shopping_list.refresh_from_db()
+        assert len(list_updates) == 1
+        assert shopping_list.last_interaction > last_interaction
+
+    def test_bulk_create_update_delete_shopping_items_returns_200(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        shopping_list = create_shopping_list("new list", user)
+        apples = ShoppingItem.objects.create(
+            name="Apples", purchased=False, shopping_list=shopping_list
+        )
+        bananas = ShoppingItem.objects.create(
+            name="Bananas", purchased=False, shopping_list=shopping_list
+        )
+
+        data = {
+            "create": [
+                {"name": "Coconut", "purchased": False},
+                {"name": "Dates", "purchased": False},
+            ],
+            "update": [{"id": str(apples.id), "purchased": True}],
+            "delete": [str(bananas.id)],
+        }
+        url = reverse("bulk-shopping-items", args=[shopping_list.pk])
+        response = client.post(url, data, format="json")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data["create"]) == 2
+        assert response.data["update"][0]["purchased"] is True
+        assert response.data["delete"] == [str(bananas.id)]
+        assert sorted(
+            shopping_list.shopping_items.values_list("name", "purchased")
+        ) == [("Apples", True), ("Coconut", False), ("Dates", False)]
+
+    def test_bulk_create_duplicate_unpurchased_item_returns_400(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        shopping_list = create_shopping_list("new list", user)
+        apples = ShoppingItem.objects.create(
+            name="Apples", purchased=False, shopping_list=shopping_list
+        )
+
+        data = {
+            "create": [{"name": "Apples", "purchased": False}],
+            "update": [{"id": str(apples.id), "name": "Green apples"}],
+        }
+        url = reverse("bulk-shopping-items", args=[shopping_list.pk])
+        response = client.post(
+            url,
+            {"create": [{"name": "Apples", "purchased": False}]},
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert shopping_list.shopping_items.count() == 1
+
+        response = client.post(url, data, format="json")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert shopping_list.shopping_items.count() == 2
+
+    @pytest.mark.parametrize("write", ["update", "delete"])
+    def test_bulk_write_of_item_not_on_list_returns_400(
+        self, write, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        shopping_list = create_shopping_list("new list", user)
+        apples = ShoppingItem.objects.create(
+            name="Apples", purchased=False, shopping_list=shopping_list
+        )
+        other_list = create_shopping_list("other list", user)
+        bread = ShoppingItem.objects.create(
+            name="Bread", purchased=False, shopping_list=other_list
+        )
+
+        items = [{"id": str(bread.id), "purchased": True}]
+        data = {
+            "create": [{"name": "Milk", "purchased": False}],
+            write: items if write == "update" else [str(apples.id), str(bread.id)],
+        }
+        url = reverse("bulk-shopping-items", args=[shopping_list.pk])
+        response = client.post(url, data, format="json")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data == ["Some items are not on the list"]
+        assert list(shopping_list.shopping_items.values_list("name", flat=True)) == [
+            "Apples"
+        ]
+        assert ShoppingItem.objects.filter(pk=bread.pk, purchased=False).exists()
+
+    def test_bulk_shopping_items_restricted_for_non_member_returns_403(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        creator_user = create_user()
+        shopping_list = create_shopping_list("new list", creator_user)
+        another_user = User.objects.create_user(
+            "another", "another@user.com", "something"
+        )
+        client = create_authenticated_client(another_user)
+
+        data = {"create": [{"name": "Apples", "purchased": False}]}
+        url = reverse("bulk-shopping-items", args=[shopping_list.pk])
+        response = client.post(url, data, format="json")
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+def full_table_scans(queries):
+    scans = []
+    table_names = connection.introspection.table_names()
+    with connection.cursor() as cursor:
+        for query in queries:
+            if not query["sql"].startswith("SELECT"):
+                continue
+            cursor.execute("EXPLAIN QUERY PLAN " + query["sql"])
+            scans += [
+                (query["sql"], row[-1])
+                for row in cursor.fetchall()
+                if re.fullmatch(r"SCAN \S+", row[-1])
+                and row[-1].split()[1] in table_names
+            ]
+    return scans
+
+
+@pytest.mark.django_db
+@pytest.mark.skipif(
+    connection.vendor != "sqlite", reason="Query plans are checked on SQLite"
+)
+class TestQueryPlans:
+    @pytest.fixture
+    def populated_shopping_list(self, create_user, create_shopping_list):
+        user = create_user()
+        shopping_list = create_shopping_list("new list", user)
+        ShoppingItem.objects.create(
+            name="Apples", purchased=False, shopping_list=shopping_list
+        )
+        ShoppingItem.objects.create(
+            name="Bananas", purchased=True, shopping_list=shopping_list
+        )
+        return shopping_list
+
+    @pytest.mark.parametrize(
+        "url_name, with_pk, query_string",
+        [
+            ("all-shopping-lists", False, ""),
+            ("shopping-list-detail", True, ""),
+            ("list-add-shopping-item", True, ""),
+            ("list-add-shopping-item", True, "?ordering=purchased,name"),
+            ("search_shopping-items", False, "?search=app"),
+        ],
+    )
+    def test_endpoint_queries_use_indexes(
+        self,
+        populated_shopping_list,
+        create_authenticated_client,
+        url_name,
+        with_pk,
+        query_string,
+    ):
+        client = create_authenticated_client(populated_shopping_list.members.get())
+        args = [populated_shopping_list.pk] if with_pk else []
+        url = reverse(url_name, args=args) + query_string
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert full_table_scans(queries) == []
+
+
+@pytest.mark.django_db
+class TestKeysetPagination:
+    def test_walk_shopping_items_with_cursor_returns_every_item_once(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        shopping_list = create_shopping_list("new list", user)
+        for index in range(12):
+            ShoppingItem.objects.create(
+                name=f"item-{index:02}",
+                purchased=index % 3 == 0,
+                shopping_list=shopping_list,
+            )
+        expected = list(
+            shopping_list.shopping_items.order_by("purchased", "id").values_list(
+                "name", flat=True
+            )
+        )
+
+        url = (
+            reverse("list-add-shopping-item", args=[shopping_list.pk])
+            + "?pagination=cursor&ordering=purchased"
+        )
+        names = []
+        pages = []
+        with CaptureQueriesContext(connection) as queries:
+            while url:
+                response = client.get(url)
+                assert response.status_code == status.HTTP_200_OK
+                assert "count" not in response.data
+                names += [item["name"] for item in response.data["results"]]
+                pages.append(response.data)
+                url = response.data["next"]
+
+        assert names == expected
+        assert len(pages) == 3
+        assert not any("COUNT(" in query["sql"] for query in queries)
+
+        response = client.get(pages[-1]["previous"])
+        assert response.data["results"] == pages[-2]["results"]
+
+    def test_shopping_lists_keep_page_numbers_by_default(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        for index in range(4):
+            create_shopping_list(f"list-{index}", user)
+
+        response = client.get(reverse("all-shopping-lists"))
+        assert response.data["count"] == 4
+
+        response = client.get(reverse("all-shopping-lists") + "?pagination=cursor")
+        assert len(response.data["results"]) == 3
+        response = client.get(response.data["next"])
+        assert len(response.data["results"]) == 1
+        assert response.data["next"] is None
+
+    def test_invalid_cursor_returns_404(self, create_user, create_authenticated_client):
+        client = create_authenticated_client(create_user())
+
+        response = client.get(reverse("search_shopping-items") + "?cursor=invalid")
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "search_backend",
+    [
+        "shopping_list.search.SQLiteFTS5SearchBackend",
+        "shopping_list.search.TrigramSearchBackend",
+    ],
+)
+class TestSearchBackends:
+    @pytest.fixture(autouse=True)
+    def use_search_backend(self, settings, search_backend):
+        if "FTS5" in search_backend and connection.vendor != "sqlite":
+            pytest.skip("FTS5 is only available on SQLite")
+        settings.SHOPPING_ITEM_SEARCH_BACKEND = search_backend
+
+    def search(self, client, query):
+        url = reverse("search_shopping-items") + f"?search={query}"
+        return [item["name"] for item in client.get(url).data["results"]]
+
+    def test_search_matches_word_prefixes_ranked(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        shopping_list = create_shopping_list("new list", user)
+        for name in ["Oat milk drink", "Milk", "Chocolate", "Buttermilk"]:
+            ShoppingItem.objects.create(
+                name=name, purchased=False, shopping_list=shopping_list
+            )
+
+        assert self.search(client, "mil") == ["Milk", "Oat milk drink"]
+        assert self.search(client, "choc") == ["Chocolate"]
+        assert self.search(client, "drink oat") == ["Oat milk drink"]
+
+    def test_search_index_follows_item_writes(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        shopping_list = create_shopping_list("new list", user)
+        shopping_item = ShoppingItem.objects.create(
+            name="Milk", purchased=False, shopping_list=shopping_list
+        )
+
+        shopping_item.name = "Bread"
+        shopping_item.save()
+        assert self.search(client, "milk") == []
+        assert self.search(client, "bread") == ["Bread"]
+
+        shopping_item.delete()
+        assert self.search(client, "bread") == []
+
+        url = reverse("bulk-shopping-items", args=[shopping_list.pk])
+        client.post(
+            url, {"create": [{"name": "Cheese", "purchased": False}]}, format="json"
+        )
+        assert self.search(client, "chee") == ["Cheese"]
+
+    def test_search_matches_whole_prefixes_only(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        shopping_list = create_shopping_list("new list", user)
+        for name in ["abxaba", "Abacus"]:
+            ShoppingItem.objects.create(
+                name=name, purchased=False, shopping_list=shopping_list
+            )
+
+        assert self.search(client, "aba") == ["Abacus"]
+
+    def test_search_returns_best_matches_among_many(
+        self, settings, create_user, create_authenticated_client, create_shopping_list
+    ):
+        settings.SHOPPING_ITEM_SEARCH_MAX_RESULTS = 3
+        user = create_user()
+        client = create_authenticated_client(user)
+        shopping_list = create_shopping_list("new list", user)
+        names = [
+            *(f"mil ilk xmilk{index}" for index in range(8)),
+            *("milk" + " extra" * extras for extras in reversed(range(6))),
+        ]
+        for name in names:
+            ShoppingItem.objects.create(
+                name=name, purchased=False, shopping_list=shopping_list
+            )
+
+        assert self.search(client, "milk") == [
+            "milk",
+            "milk extra",
+            "milk extra extra",
+        ]
+
+    def test_walk_search_results_with_cursor(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        shopping_list = create_shopping_list("new list", user)
+        for index in range(12):
+            ShoppingItem.objects.create(
+                name="milk " * (index + 1), purchased=False, shopping_list=shopping_list
+            )
+        expected = self.search(client, "milk")
+
+        url = reverse("search_shopping-items") + "?search=milk&pagination=cursor"
+        names = []
+        pages = []
+        while url:
+            response = client.get(url)
+            names += [item["name"] for item in response.data["results"]]
+            pages.append(response.data)
+            url = response.data["next"]
+
+        assert sorted(names) == sorted(
+            ShoppingItem.objects.values_list("name", flat=True)
+        )
+        assert names[: len(expected)] == expected
+        response = client.get(pages[-1]["previous"])
+        assert response.data["results"] == pages[-2]["results"]
+
+
+@pytest.mark.django_db
+class TestResponseCache:
+    def test_shopping_list_detail_served_from_cache_until_item_changes(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        shopping_list = create_shopping_list("new list", user)
+        url = reverse("shopping-list-detail", args=[shopping_list.pk])
+
+        first_response = client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            cached_response = client.get(url)
+
+        assert cached_response.data == first_response.data
+        assert cached_response["ETag"] == first_response["ETag"]
+        assert not any("shopping_list_shoppingitem" in q["sql"] for q in queries)
+
+        ShoppingItem.objects.create(
+            name="Apples", purchased=False, shopping_list=shopping_list
+        )
+        response = client.get(url)
+
+        assert response["ETag"] != first_response["ETag"]
+        assert response.data["unpurchased_items"] == [{"name": "Apples"}]
+
+    def test_matching_if_none_match_returns_304(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        create_shopping_list("new list", user)
+        url = reverse("all-shopping-lists")
+
+        etag = client.get(url)["ETag"]
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.content == b""
+
+        create_shopping_list("another list", user)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data["results"]) == 2
+
+    def test_shopping_items_answer_if_modified_since_in_full(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        shopping_list = create_shopping_list("new list", user)
+        url = reverse("list-add-shopping-item", args=[shopping_list.pk])
+
+        response = client.get(url)
+        # Whole seconds could hide a change made in the second of the response.
+        ShoppingItem.objects.create(
+            name="Apples", purchased=False, shopping_list=shopping_list
+        )
+        since = (timezone.now() + timedelta(days=1)).strftime(
+            "%a, %d %b %Y %H:%M:%S GMT"
+        )
+        response_since = client.get(url, HTTP_IF_MODIFIED_SINCE=since)
+
+        assert "Last-Modified" not in response
+        assert response_since.status_code == status.HTTP_200_OK
+        assert [item["name"] for item in response_since.data["results"]] == ["Apples"]
+
+    def test_missing_shopping_list_returns_404_to_non_members(
+        self, create_user, create_authenticated_client
+    ):
+        client = create_authenticated_client(create_user())
+
+        response = client.get(reverse("shopping-list-detail", args=[uuid.uuid4()]))
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+class TestChangeFeed:
+    def test_item_changes_published_after_commit(
+        self,
+        create_user,
+        create_authenticated_client,
+        create_shopping_list,
+        django_capture_on_commit_callbacks,
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        shopping_list = create_shopping_list("new list", user)
+        url = reverse("list-add-shopping-item", args=[shopping_list.pk])
+
+        with mock.patch("shopping_list.events.get_event_broker") as broker:
+            with django_capture_on_commit_callbacks(execute=True):
+                response = client.post(
+                    url, {"name": "Apples", "purchased": False}, format="json"
+                )
+            assert broker.return_value.publish.call_count == 1
+
+        event = broker.return_value.publish.call_args.args[0]
+        assert event == {
+            "type": "item.created",
+            "shopping_list": str(shopping_list.pk),
+            "item": {"id": response.data["id"], "name": "Apples", "purchased": False},
+        }
+
+    def test_stream_only_sends_events_of_member_lists(
+        self, create_user, create_shopping_list
+    ):
+        user = create_user()
+        shopping_list = create_shopping_list("new list", user)
+        other_shopping_list = create_shopping_list(
+            "other list", User.objects.create_user("bob", "bob@user.com", "something")
+        )
+        broker = InProcessEventBroker()
+
+        async def read_stream():
+            stream = stream_events(user)
+            chunks = [await anext(stream)]
+            next_chunk = asyncio.ensure_future(anext(stream))
+            while not broker._subscribers:
+                await asyncio.sleep(0)
+
+            for shopping_list_id in (other_shopping_list.pk, shopping_list.pk):
+                broker.publish(
+                    {"type": "list.updated", "shopping_list": str(shopping_list_id)}
+                )
+            chunks.append(await next_chunk)
+            await stream.aclose()
+            return chunks
+
+        with mock.patch(
+            "shopping_list.api.change_feed.get_event_broker", return_value=broker
+        ):
+            chunks = async_to_sync(read_stream)()
+
+        assert chunks[0].startswith("retry:")
+        assert chunks[1].startswith("event: list.updated\n")
+        assert str(shopping_list.pk) in chunks[1]
+        assert not broker._subscribers
+
+    def test_membership_changes_update_visible_lists(self):
+        visible = {"a"}
+
+        assert not is_visible(
+            {"type": "item.created", "shopping_list": "b"}, 1, visible
+        )
+        assert is_visible(
+            {"type": "members.added", "shopping_list": "b", "members": [1]}, 1, visible
+        )
+        assert is_visible({"type": "item.created", "shopping_list": "b"}, 1, visible)
+        assert is_visible(
+            {"type": "members.removed", "shopping_list": "a", "members": [1]},
+            1,
+            visible,
+        )
+        assert not is_visible(
+            {"type": "item.created", "shopping_list": "a"}, 1, visible
+        )
+
+    def test_refused_without_asgi(self, create_user, create_authenticated_client):
+        client = create_authenticated_client(create_user())
+
+        response = client.get(reverse("change-feed"))
+
+        assert response.status_code == status.HTTP_501_NOT_IMPLEMENTED
+
+    def test_streams_under_asgi(self, create_user):
+        user = create_user()
+
+        async def read_first_chunk():
+            client = AsyncClient()
+            await client.aforce_login(user)
+            response = await client.get(reverse("change-feed"))
+            chunks = aiter(response.streaming_content)
+            return response, await anext(chunks)
+
+        response, chunk = async_to_sync(read_first_chunk)()
+        assert response["Content-Type"] == "text/event-stream"
+        assert chunk == b"retry: 3000\n\n"
+
+    def test_not_authenticated_returns_401(self):
+        response = APIClient().get(reverse("change-feed"))
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+class TestSync:
+    def test_sync_returns_only_changes_since_token(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        shopping_list = create_shopping_list("new list", user)
+        apples = ShoppingItem.objects.create(
+            name="Apples", purchased=False, shopping_list=shopping_list
+        )
+        oranges = ShoppingItem.objects.create(
+            name="Oranges", purchased=False, shopping_list=shopping_list
+        )
+        ShoppingItem.objects.create(
+            name="Pears", purchased=False, shopping_list=shopping_list
+        )
+        url = reverse("sync")
+
+        response = client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data["shopping_lists"]["updated"]) == 1
+        assert len(response.data["shopping_items"]["updated"]) == 3
+        assert response.data["members"]["added"] == [
+            {"shopping_list": str(shopping_list.pk), "user": user.pk}
+        ]
+
+        apples.purchased = True
+        apples.save()
+        oranges_id = oranges.pk
+        oranges.delete()
+        response = client.get(url, {"sync_token": response.data["sync_token"]})
+
+        assert [
+            item["name"] for item in response.data["shopping_items"]["updated"]
+        ] == ["Apples"]
+        assert response.data["shopping_items"]["deleted"] == [str(oranges_id)]
+        assert response.data["shopping_lists"]["updated"][0]["id"] == str(
+            shopping_list.pk
+        )
+
+        response = client.get(url, {"sync_token": response.data["sync_token"]})
+
+        assert response.data["shopping_lists"]["updated"] == []
+        assert response.data["shopping_items"]["updated"] == []
+        assert response.data["shopping_items"]["deleted"] == []
+
+    def test_sync_returns_tombstones_of_left_and_deleted_lists(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        left_shopping_list = create_shopping_list("left list", user)
+        deleted_shopping_list = create_shopping_list("deleted list", user)
+        ShoppingItem.objects.create(
+            name="Apples", purchased=False, shopping_list=deleted_shopping_list
+        )
+        url = reverse("sync")
+
+        sync_token = client.get(url).data["sync_token"]
+        left_shopping_list.members.remove(user)
+        ShoppingItem.objects.create(
+            name="Oranges", purchased=False, shopping_list=left_shopping_list
+        )
+        deleted_shopping_list_id = deleted_shopping_list.pk
+        deleted_shopping_list.delete()
+        response = client.get(url, {"sync_token": sync_token})
+
+        assert sorted(response.data["shopping_lists"]["deleted"]) == sorted(
+            [str(left_shopping_list.pk), str(deleted_shopping_list_id)]
+        )
+        assert response.data["shopping_items"]["updated"] == []
+
+    def test_sync_returns_every_row_of_joined_list(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        another_user = User.objects.create_user("bob", "bob@user.com", "something")
+        shopping_list = create_shopping_list("bob's list", another_user)
+        ShoppingItem.objects.create(
+            name="Apples", purchased=False, shopping_list=shopping_list
+        )
+        url = reverse("sync")
+
+        sync_token = client.get(url).data["sync_token"]
+        shopping_list.members.add(user)
+        response = client.get(url, {"sync_token": sync_token})
+
+        assert response.data["shopping_lists"]["updated"][0]["id"] == str(
+            shopping_list.pk
+        )
+        assert response.data["shopping_items"]["updated"][0]["name"] == "Apples"
+        assert len(response.data["members"]["added"]) == 2
+
+    def test_sync_pages_through_changes(
+        self, create_user, create_authenticated_client, create_shopping_list, settings
+    ):
+        settings.SHOPPING_LIST_SYNC_MAX_CHANGES = 2
+        user = create_user()
+        client = create_authenticated_client(user)
+        shopping_list = create_shopping_list("new list", user)
+        url = reverse("sync")
+
+        sync_token = client.get(url).data["sync_token"]
+        for name in ["Apples", "Oranges", "Pears"]:
+            ShoppingItem.objects.create(
+                name=name, purchased=False, shopping_list=shopping_list
+            )
+        first_page = client.get(url, {"sync_token": sync_token}).data
+        second_page = client.get(url, {"sync_token": first_page["sync_token"]}).data
+
+        assert first_page["has_more"]
+        assert not second_page["has_more"]
+        assert len(first_page["shopping_items"]["updated"]) == 2
+        assert sorted(
+            item["name"]
+            for page in (first_page, second_page)
+            for item in page["shopping_items"]["updated"]
+        ) == ["Apples", "Oranges", "Pears"]
+
+    def test_expired_sync_token_returns_410(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        shopping_list = create_shopping_list("new list", user)
+        url = reverse("sync")
+
+        sync_token = client.get(url).data["sync_token"]
+        ShoppingItem.objects.create(
+            name="Apples", purchased=False, shopping_list=shopping_list
+        )
+        call_command("prune_sync_changes", days=-1, stdout=io.StringIO())
+        response = client.get(url, {"sync_token": sync_token})
+
+        assert response.status_code == status.HTTP_410_GONE
+
+        response = client.get(url, {"sync_token": "abc"})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_sync_token_stops_before_uncommitted_changes(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        shopping_list = create_shopping_list("new list", user)
+        url = reverse("sync")
+        sync_token = client.get(url).data["sync_token"]
+
+        for name in ["Apples", "Oranges", "Pears"]:
+            ShoppingItem.objects.create(
+                name=name, purchased=False, shopping_list=shopping_list
+            )
+        # Oranges' change took its id, but its transaction is still open.
+        oranges_change = ShoppingListChange.objects.get(
+            object_id=str(shopping_list.shopping_items.get(name="Oranges").pk)
+        )
+        oranges_change_id = oranges_change.pk
+        oranges_change.delete()
+        response = client.get(url, {"sync_token": sync_token})
+
+        assert [
+            item["name"] for item in response.data["shopping_items"]["updated"]
+        ] == ["Apples"]
+
+        oranges_change.pk = oranges_change_id
+        oranges_change.save(force_insert=True)
+        response = client.get(url, {"sync_token": response.data["sync_token"]})
+
+        assert sorted(
+            item["name"] for item in response.data["shopping_items"]["updated"]
+        ) == ["Oranges", "Pears"]
+
+    def test_old_gaps_in_the_change_ids_are_skipped(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        shopping_list = create_shopping_list("new list", user)
+        url = reverse("sync")
+        sync_token = client.get(url).data["sync_token"]
+
+        for name in ["Apples", "Oranges", "Pears"]:
+            ShoppingItem.objects.create(
+                name=name, purchased=False, shopping_list=shopping_list
+            )
+        ShoppingListChange.objects.get(
+            object_id=str(shopping_list.shopping_items.get(name="Oranges").pk)
+        ).delete()
+        ShoppingListChange.objects.update(
+            created_at=timezone.now() - timedelta(minutes=1)
+        )
+        response = client.get(url, {"sync_token": sync_token})
+
+        assert sorted(
+            item["name"] for item in response.data["shopping_items"]["updated"]
+        ) == ["Apples", "Pears"]
+
+    def test_snapshot_pages_through_items(
+        self, create_user, create_authenticated_client, create_shopping_list, settings
+    ):
+        settings.SHOPPING_LIST_SYNC_MAX_CHANGES = 2
+        user = create_user()
+        client = create_authenticated_client(user)
+        shopping_list = create_shopping_list("new list", user)
+        for name in ["Apples", "Oranges", "Pears"]:
+            ShoppingItem.objects.create(
+                name=name, purchased=False, shopping_list=shopping_list
+            )
+        url = reverse("sync")
+
+        first_page = client.get(url).data
+        second_page = client.get(url, {"sync_token": first_page["sync_token"]}).data
+
+        assert first_page["has_more"]
+        assert len(first_page["shopping_items"]["updated"]) == 2
+        assert len(first_page["shopping_lists"]["updated"]) == 1
+        assert len(first_page["members"]["added"]) == 1
+        assert not second_page["has_more"]
+        assert len(second_page["shopping_items"]["updated"]) == 1
+        assert second_page["shopping_lists"]["updated"] == []
+        assert second_page["sync_token"] == first_page["sync_token"].split(":")[0]
+
+        ShoppingItem.objects.create(
+            name="Bananas", purchased=False, shopping_list=shopping_list
+        )
+        response = client.get(url, {"sync_token": second_page["sync_token"]})
+
+        assert [
+            item["name"] for item in response.data["shopping_items"]["updated"]
+        ] == ["Bananas"]
+
+    def test_sync_token_is_not_expired_by_an_empty_log(
+        self, create_user, create_authenticated_client
+    ):
+        client = create_authenticated_client(create_user())
+        ShoppingListChange.objects.all().delete()
+
+        response = client.get(reverse("sync"), {"sync_token": "5"})
+
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_prune_keeps_the_newest_change(self, create_user, create_shopping_list):
+        create_shopping_list("new list", create_user())
+        newest = ShoppingListChange.objects.latest("id")
+
+        call_command("prune_sync_changes", days=-1, stdout=io.StringIO())
+
+        assert list(ShoppingListChange.objects.all()) == [newest]
+
+    def test_invalid_sync_token_returns_400(
+        self, create_user, create_authenticated_client
+    ):
+        client = create_authenticated_client(create_user())
+
+        for sync_token in ["-1", "5:apples", ":"]:
+            response = client.get(reverse("sync"), {"sync_token": sync_token})
+
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("async_views")
+class TestAsyncViews:
+    def test_async_views_served_when_enabled(self):
+        for url in [
+            reverse("all-shopping-lists"),
+            reverse("search_shopping-items"),
+        ]:
+            assert asyncio.iscoroutinefunction(resolve(url).func)
+
+    def test_shopping_lists_listed_with_unpurchased_items(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        shopping_list = create_shopping_list("new list", user)
+        ShoppingItem.objects.create(
+            name="Apples", purchased=False, shopping_list=shopping_list
+        )
+
+        response = client.get(reverse("all-shopping-lists"))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["results"][0]["unpurchased_items"] == [{"name": "Apples"}]
+
+    def test_shopping_list_detail_forbidden_to_non_members(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        shopping_list = create_shopping_list("new list", create_user())
+        another_user = User.objects.create_user("bob", "bob@user.com", "something")
+        client = create_authenticated_client(another_user)
+        url = reverse("shopping-list-detail", args=[shopping_list.pk])
+
+        assert client.get(url).status_code == status.HTTP_403_FORBIDDEN
+        assert client.delete(url).status_code == status.HTTP_403_FORBIDDEN
+
+    def test_shopping_item_created_and_listed(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        shopping_list = create_shopping_list("new list", user)
+        url = reverse("list-add-shopping-item", args=[shopping_list.pk])
+
+        response = client.post(url, {"name": "Apples", "purchased": False})
+
+        assert response.status_code == status.HTTP_201_CREATED
+
+        response = client.get(url)
+
+        assert [item["name"] for item in response.data["results"]] == ["Apples"]
+        assert client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code == (
+            status.HTTP_304_NOT_MODIFIED
+        )
+
+    def test_search_returns_matching_shopping_items(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        shopping_list = create_shopping_list("new list", user)
+        ShoppingItem.objects.create(
+            name="Apples", purchased=False, shopping_list=shopping_list
+        )
+
+        response = client.get(reverse("search_shopping-items"), {"search": "app"})
+
+        assert [item["name"] for item in response.data["results"]] == ["Apples"]
+
+    def test_shopping_items_streamed(self, settings, create_user, create_shopping_list):
+        settings.SHOPPING_LIST_STREAM_CHUNK_SIZE = 2
+        user = create_user()
+        shopping_list = create_shopping_list("new list", user)
+        for name in ["Apples", "Bananas", "Pears"]:
+            ShoppingItem.objects.create(
+                name=name, purchased=False, shopping_list=shopping_list
+            )
+        url = reverse("list-add-shopping-item", args=[shopping_list.pk])
+
+        async def read_stream():
+            client = AsyncClient()
+            await client.aforce_login(user)
+            response = await client.get(url, {"stream": "1", "ordering": "name"})
+            return b"".join([chunk async for chunk in response.streaming_content])
+
+        items = json.loads(async_to_sync(read_stream)())
+        assert [item["name"] for item in items] == ["Apples", "Bananas", "Pears"]
+
+    def test_not_authenticated_returns_401(self):
+        response = APIClient().get(reverse("all-shopping-lists"))
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("atomic_increment", [True, False])
+class TestThrottling:
+    @pytest.fixture(autouse=True)
+    def throttle_rates(self, settings, atomic_increment):
+        settings.REST_FRAMEWORK = {
+            **settings.REST_FRAMEWORK,
+            "DEFAULT_THROTTLE_RATES": {
+                "anon": "2/hour",
+                "user_minute": "2/minute",
+                "user_day": "3/day",
+            },
+        }
+        cache.clear()
+        with (
+            mock.patch.object(
+                FixedWindowRateThrottle, "atomic_increment", atomic_increment
+            ),
+            mock.patch.object(
+                FixedWindowRateThrottle, "timer", mock.Mock(return_value=1_000_000.0)
+            ) as timer,
+        ):
+            yield timer
+        cache.clear()
+
+    def test_requests_over_rate_return_429_until_window_ends(
+        self, create_user, create_authenticated_client, throttle_rates
+    ):
+        client = create_authenticated_client(create_user())
+        url = reverse("all-shopping-lists")
+
+        assert client.get(url).status_code == status.HTTP_200_OK
+        assert client.get(url).status_code == status.HTTP_200_OK
+        response = client.get(url)
+
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert response["Retry-After"] == "20"
+
+        throttle_rates.return_value += 60
+
+        assert client.get(url).status_code == status.HTTP_200_OK
+        response = client.get(url)
+
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert int(response["Retry-After"]) > 60
+
+    def test_denied_requests_do_not_count(
+        self, create_user, create_authenticated_client, throttle_rates
+    ):
+        client = create_authenticated_client(create_user())
+        url = reverse("all-shopping-lists")
+
+        for _ in range(5):
+            client.get(url)
+        throttle_rates.return_value += 60
+
+        assert client.get(url).status_code == status.HTTP_200_OK
+
+    def test_anonymous_requests_throttled_by_anon_rate(self, throttle_rates):
+        request = Request(APIRequestFactory().get("/"))
+        throttle = DefaultRateThrottle()
+
+        assert throttle.allow_request(request, None)
+        assert throttle.allow_request(request, None)
+        throttle_rates.return_value += 60
+
+        assert not throttle.allow_request(request, None)
+        assert throttle.wait() == 60 * 60 - throttle_rates.return_value % (60 * 60)
+
+    def test_batched_path_makes_one_read_and_one_write(
+        self, create_user, create_authenticated_client, atomic_increment
+    ):
+        if atomic_increment:
+            pytest.skip("atomic increments are not batched")
+        client = create_authenticated_client(create_user())
+
+        with (
+            mock.patch.object(cache, "get_many", wraps=cache.get_many) as get_many,
+            mock.patch.object(cache, "set_many", wraps=cache.set_many) as set_many,
+        ):
+            client.get(reverse("all-shopping-lists"))
+
+        throttle_calls = [
+            call for call in get_many.call_args_list if "throttle:" in str(call)
+        ]
+        assert len(throttle_calls) == 1
+        assert len(throttle_calls[0].args[0]) == 2
+        assert set_many.call_count == 1
+
+
+class TestPrimaryReplicaRouter:
+    @pytest.fixture(autouse=True)
+    def replicas(self, settings):
+        settings.SHOPPING_LIST_DATABASE_REPLICAS = ["replica"]
+        cache.clear()
+        with mock.patch.object(connections["default"], "in_atomic_block", False):
+            yield
+        cache.clear()
+
+    def request(self, user, read_or_write, cookies=None):
+        request = RequestFactory().get("/")
+        request.user = user
+        request.COOKIES.update(cookies or {})
+
+        def get_response(request):
+            read_or_write(request)
+            return HttpResponse()
+
+        response = PrimaryStickinessMiddleware(get_response)(request)
+        return {name: morsel.value for name, morsel in response.cookies.items()}
+
+    def test_reads_go_to_replica_and_writes_to_primary(self):
+        router = PrimaryReplicaRouter()
+
+        assert router.db_for_read(ShoppingList) == "replica"
+        assert router.db_for_write(ShoppingItem) == "default"
+        assert router.db_for_read(Token) is None
+
+    def test_reads_after_write_go_to_primary_for_sticky_window(self, settings):
+        router = PrimaryReplicaRouter()
+        user = User(pk=1)
+        databases = []
+
+        def write_then_read(request):
+            databases.append(router.db_for_write(ShoppingItem))
+            databases.append(router.db_for_read(ShoppingItem))
+
+        def read(request):
+            databases.append(router.db_for_read(ShoppingItem))
+
+        assert self.request(user, read) == {}
+        cookies = self.request(user, write_then_read)
+        # Another process, with its own caches, serves the next requests.
+        cache.clear()
+        self.request(user, read, cookies)
+        self.request(User(pk=2), read, cookies)
+        self.request(user, read)
+
+        assert databases == [
+            "replica",
+            "default",
+            "default",
+            "default",
+            "replica",
+            "replica",
+        ]
+
+        later = time.time() + settings.SHOPPING_LIST_PRIMARY_STICKY_SECONDS + 1
+        with mock.patch("time.time", return_value=later):
+            self.request(user, read, cookies)
+
+        assert databases[-1] == "replica"
+
+    def test_reads_in_transaction_go_to_primary(self):
+        with mock.patch.object(connections["default"], "in_atomic_block", True):
+            assert PrimaryReplicaRouter().db_for_read(ShoppingList) == "default"
+
+
+@pytest.mark.django_db
+class TestShoppingListSummaries:
+    def test_summaries_follow_item_writes(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        shopping_list = create_shopping_list("new list", user)
+        items_url = reverse("list-add-shopping-item", args=[shopping_list.pk])
+
+        for name in ["Pears", "Apples", "Milk", "Bread"]:
+            client.post(items_url, {"name": name, "purchased": False})
+        shopping_list.refresh_from_db()
+
+        assert shopping_list.item_count == 4
+        assert shopping_list.unpurchased_item_count == 4
+        assert shopping_list.unpurchased_items_preview == ["Apples", "Bread", "Milk"]
+
+        apples = ShoppingItem.objects.get(name="Apples")
+        bread = ShoppingItem.objects.get(name="Bread")
+        client.patch(
+            reverse("shopping-item-detail", args=[shopping_list.pk, apples.pk]),
+            {"purchased": True},
+        )
+        client.post(
+            reverse("bulk-shopping-items", args=[shopping_list.pk]),
+            {
+                "delete": [str(bread.pk)],
+                "create": [{"name": "Eggs", "purchased": True}],
+            },
+            format="json",
+        )
+        shopping_list.refresh_from_db()
+
+        assert shopping_list.item_count == 4
+        assert shopping_list.unpurchased_item_count == 2
+        assert shopping_list.unpurchased_items_preview == ["Milk", "Pears"]
+
+    def test_item_writes_count_without_reading_every_item(
+        self,
+        create_user,
+        create_authenticated_client,
+        create_shopping_list,
+        create_shopping_items,
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        shopping_list = create_shopping_list("new list", user)
+        create_shopping_items(shopping_list, 20)
+        items_url = reverse("list-add-shopping-item", args=[shopping_list.pk])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post(items_url, {"name": "Apples", "purchased": False})
+            client.patch(
+                reverse(
+                    "shopping-item-detail", args=[shopping_list.pk, response.data["id"]]
+                ),
+                {"purchased": True},
+            )
+        shopping_list.refresh_from_db()
+
+        assert shopping_list.item_count == 21
+        assert shopping_list.unpurchased_item_count == 15
+        assert shopping_list.unpurchased_items_preview == [
+            "item 00001",
+            "item 00002",
+            "item 00003",
+        ]
+        assert not any(" OVER " in query["sql"] for query in queries)
+
+    @pytest.mark.parametrize("write", ["delete", "purchase"])
+    def test_item_written_through_two_instances_counts_once(
+        self, write, create_user, create_shopping_list
+    ):
+        shopping_list = create_shopping_list("new list", create_user())
+        ShoppingItem.objects.create(
+            name="Apples", purchased=False, shopping_list=shopping_list
+        )
+        # Both read before either writes, like two concurrent requests.
+        shopping_items = [ShoppingItem.objects.get(), ShoppingItem.objects.get()]
+
+        for shopping_item in shopping_items:
+            if write == "delete":
+                shopping_item.delete()
+            else:
+                shopping_item.purchased = True
+                shopping_item.save()
+        shopping_list.refresh_from_db()
+
+        assert shopping_list.item_count == ShoppingItem.objects.count()
+        assert shopping_list.unpurchased_item_count == (
+            ShoppingItem.objects.filter(purchased=False).count()
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.skipif(
+        not connection.features.has_select_for_update,
+        reason="SQLite runs one writer at a time",
+    )
+    @pytest.mark.parametrize("write", ["delete", "purchase", "bulk delete"])
+    def test_concurrent_writers_count_item_once(
+        self, write, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        shopping_list = create_shopping_list("new list", user)
+        for name in ["Apples", "Bread"]:
+            ShoppingItem.objects.create(
+                name=name, purchased=False, shopping_list=shopping_list
+            )
+        apples = ShoppingItem.objects.get(name="Apples")
+        barrier = threading.Barrier(2)
+
+        def writer():
+            try:
+                client = create_authenticated_client(user)
+                shopping_item = ShoppingItem.objects.get(pk=apples.pk)
+                barrier.wait()
+                if write == "delete":
+                    shopping_item.delete()
+                elif write == "purchase":
+                    shopping_item.purchased = True
+                    shopping_item.save()
+                else:
+                    client.post(
+                        reverse("bulk-shopping-items", args=[shopping_list.pk]),
+                        {"delete": [str(apples.pk)]},
+                        format="json",
+                    )
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=writer) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        shopping_list.refresh_from_db()
+
+        assert shopping_list.item_count == ShoppingItem.objects.count()
+        assert shopping_list.unpurchased_item_count == (
+            ShoppingItem.objects.filter(purchased=False).count()
+        )
+
+    def test_saving_unread_item_counts_items_again(
+        self, create_user, create_shopping_list
+    ):
+        shopping_list = create_shopping_list("new list", create_user())
+        shopping_item = ShoppingItem.objects.create(
+            name="Apples", purchased=False, shopping_list=shopping_list
+        )
+
+        ShoppingItem(
+            id=shopping_item.id,
+            name="Apples",
+            purchased=True,
+            shopping_list=shopping_list,
+        ).save(force_update=True)
+        shopping_list.refresh_from_db()
+
+        assert shopping_list.item_count == 1
+        assert shopping_list.unpurchased_item_count == 0
+        assert shopping_list.unpurchased_items_preview == []
+
+    def test_renaming_shopping_list_keeps_item_summaries(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        shopping_list = create_shopping_list("new list", user)
+        ShoppingItem.objects.create(
+            name="Apples", purchased=False, shopping_list=shopping_list
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            client.patch(
+                reverse("shopping-list-detail", args=[shopping_list.pk]),
+                {"name": "renamed"},
+            )
+        shopping_list.refresh_from_db()
+
+        list_updates = [
+            query["sql"]
+            for query in queries
+            if query["sql"].startswith('UPDATE "shopping_list_shoppinglist"')
+        ]
+        assert shopping_list.name == "renamed"
+        assert shopping_list.item_count == 1
+        assert len(list_updates) == 1
+        assert "item_count" not in list_updates[0]
+
+    def test_shopping_lists_listed_without_reading_items(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        shopping_list = create_shopping_list("new list", user)
+        ShoppingItem.objects.create(
+            name="Apples", purchased=False, shopping_list=shopping_list
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse("all-shopping-lists"))
+
+        result = response.data["results"][0]
+        assert result["unpurchased_items"] == [{"name": "Apples"}]
+        assert result["item_count"] == 1
+        assert result["unpurchased_item_count"] == 1
+        assert not any("shopping_list_shoppingitem" in q["sql"] for q in queries)
+
+    def test_rebuild_command_restores_summaries(
+        self, create_user, create_shopping_list
+    ):
+        shopping_list = create_shopping_list("new list", create_user())
+        ShoppingItem.objects.create(
+            name="Apples", purchased=False, shopping_list=shopping_list
+        )
+        ShoppingList.objects.update(
+            item_count=0, unpurchased_item_count=0, unpurchased_items_preview=[]
+        )
+        last_interaction = ShoppingList.objects.get().last_interaction
+
+        call_command("rebuild_shopping_list_summaries", stdout=io.StringIO())
+        shopping_list.refresh_from_db()
+
+        assert shopping_list.item_count == 1
+        assert shopping_list.unpurchased_items_preview == ["Apples"]
+        assert shopping_list.last_interaction == last_interaction
+
+
+@pytest.mark.django_db
+class TestShoppingListInbox:
+    def test_entries_follow_membership(self, create_user, create_shopping_list):
+        user = create_user()
+        bob = User.objects.create_user("bob", "bob@user.com", "something")
+        shopping_list = create_shopping_list("new list", user)
+
+        shopping_list.members.add(bob)
+        assert set(
+            ShoppingListInboxEntry.objects.values_list("user_id", flat=True)
+        ) == {user.pk, bob.pk}
+
+        bob.shoppinglist_set.remove(shopping_list)
+        assert list(
+            ShoppingListInboxEntry.objects.values_list("user_id", flat=True)
+        ) == [user.pk]
+
+        shopping_list.members.clear()
+        assert not ShoppingListInboxEntry.objects.exists()
+
+    def test_creator_is_owner(self, create_user, create_authenticated_client):
+        user = create_user()
+        client = create_authenticated_client(user)
+
+        client.post(reverse("all-shopping-lists"), {"name": "Groceries"})
+
+        entry = ShoppingListInboxEntry.objects.get()
+        assert entry.user == user
+        assert entry.role == ShoppingListInboxEntry.OWNER
+
+    def test_deleted_shopping_list_leaves_inbox(
+        self, create_user, create_shopping_list
+    ):
+        shopping_list = create_shopping_list("new list", create_user())
+
+        shopping_list.delete()
+
+        assert not ShoppingListInboxEntry.objects.exists()
+
+    def test_item_writes_reorder_inbox(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        older = create_shopping_list("older", user)
+        create_shopping_list("newer", user)
+
+        client.post(
+            reverse("list-add-shopping-item", args=[older.pk]),
+            {"name": "Apples", "purchased": False},
+        )
+        response = client.get(reverse("all-shopping-lists"))
+
+        assert [result["name"] for result in response.data["results"]] == [
+            "older",
+            "newer",
+        ]
+        entry = ShoppingListInboxEntry.objects.get(shopping_list=older)
+        older.refresh_from_db()
+        assert entry.last_interaction == older.last_interaction
+
+    def test_keyset_pages_follow_inbox_order(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        for number in range(7):
+            create_shopping_list(f"list {number}", user)
+
+        url = reverse("all-shopping-lists") + "?pagination=cursor"
+        names = []
+        while url:
+            response = client.get(url)
+            names += [result["name"] for result in response.data["results"]]
+            url = response.data["next"]
+
+        assert names == [f"list {number}" for number in reversed(range(7))]
+
+    def test_index_does_not_read_memberships(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        create_shopping_list("new list", user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse("all-shopping-lists"))
+
+        assert response.status_code == status.HTTP_200_OK
+        index_query = next(
+            q["sql"]
+            for q in queries
+            if "shopping_list_shoppinglistinboxentry" in q["sql"]
+        )
+        assert "shopping_list_shoppinglist_members" not in index_query
+
+
+@pytest.mark.django_db
+class TestInstrumentation:
+    @pytest.fixture(autouse=True)
+    def reset_metrics(self):
+        metrics.reset()
+
+    def test_server_timing_counts_queries(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        create_shopping_list("new list", user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse("all-shopping-lists"))
+
+        server_timing = response.headers["Server-Timing"]
+        assert f'desc="{len(queries)} queries"' in server_timing
+        assert re.search(r"serialize;dur=\d+\.\d+", server_timing)
+        assert re.search(r"total;dur=\d+\.\d+", server_timing)
+
+    def test_metrics_aggregate_per_view(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        user.is_staff = True
+        user.save()
+        client = create_authenticated_client(user)
+        shopping_list = create_shopping_list("new list", user)
+
+        client.get(reverse("all-shopping-lists"))
+        client.get(reverse("all-shopping-lists"))
+        client.get(reverse("shopping-list-detail", args=[shopping_list.pk]))
+        response = client.get(reverse("metrics"))
+
+        assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+        body = response.content.decode()
+        assert (
+            'shopping_list_request_duration_seconds_bucket{view="all-shopping-lists",le="+Inf"} 2'
+            in body
+        )
+        assert 'shopping_list_db_queries_count{view="shopping-list-detail"} 1' in body
+
+    def test_metrics_require_staff_or_token(
+        self, settings, create_user, create_authenticated_client
+    ):
+        settings.SHOPPING_LIST_METRICS_TOKEN = "scraper-secret"
+        url = reverse("metrics")
+
+        assert APIClient().get(url).status_code == status.HTTP_403_FORBIDDEN
+        client = create_authenticated_client(create_user())
+        assert client.get(url).status_code == status.HTTP_403_FORBIDDEN
+        assert (
+            APIClient().get(url, HTTP_AUTHORIZATION="Bearer wrong").status_code
+            == status.HTTP_403_FORBIDDEN
+        )
+        response = APIClient().get(url, HTTP_AUTHORIZATION="Bearer scraper-secret")
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_server_timing_header_can_be_turned_off(
+        self, settings, create_user, create_authenticated_client
+    ):
+        settings.SHOPPING_LIST_SERVER_TIMING = False
+        client = create_authenticated_client(create_user())
+
+        response = client.get(reverse("all-shopping-lists"))
+
+        assert "Server-Timing" not in response.headers
+        assert 'view="all-shopping-lists"' in metrics.render()
+
+    def test_disabled_instrumentation_is_not_used(
+        self, settings, create_user, create_authenticated_client
+    ):
+        settings.SHOPPING_LIST_INSTRUMENTATION = False
+        client = create_authenticated_client(create_user())
+
+        response = client.get(reverse("all-shopping-lists"))
+
+        assert "Server-Timing" not in response.headers
+        assert client.get(reverse("metrics")).status_code == 404
+
+
+@pytest.mark.django_db
+class TestMemberManagement:
+    def test_add_members_by_username_and_email(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        shopping_list = create_shopping_list("my list", user)
+        bob = User.objects.create_user("bob", "bob@user.com", "something")
+        alice = User.objects.create_user("alice", "alice@user.com", "something")
+
+        response = client.put(
+            reverse("shopping-list-add-members", args=[shopping_list.pk]),
+            {"usernames": ["bob"], "emails": ["alice@user.com"]},
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert sorted(response.data["members"]) == sorted([user.pk, bob.pk, alice.pk])
+
+    def test_unknown_users_are_reported_per_field(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        shopping_list = create_shopping_list("my list", user)
+        User.objects.create_user("bob", "shared@user.com", "something")
+        User.objects.create_user("alice", "shared@user.com", "something")
+
+        response = client.put(
+            reverse("shopping-list-add-members", args=[shopping_list.pk]),
+            {
+                "members": [user.pk, 999],
+                "usernames": ["nobody"],
+                "emails": ["shared@user.com"],
+            },
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data == {
+            "members": ['Invalid pk "999" - object does not exist.'],
+            "usernames": ['No user with username "nobody".'],
+            "emails": ['More than one user with email "shared@user.com".'],
+        }
+        assert list(shopping_list.members.all()) == [user]
+
+    def test_empty_payload_is_rejected(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        shopping_list = create_shopping_list("my list", user)
+
+        response = client.put(
+            reverse("shopping-list-add-members", args=[shopping_list.pk]),
+            {"members": []},
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_query_count_does_not_grow_with_members(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        team = User.objects.bulk_create(
+            User(username=f"member{index}", email=f"member{index}@user.com")
+            for index in range(60)
+        )
+
+        query_counts = []
+        for url_name in ["shopping-list-add-members", "shopping-list-remove-members"]:
+            for size in [2, 60]:
+                shopping_list = create_shopping_list(f"{url_name} {size}", user)
+                if url_name == "shopping-list-remove-members":
+                    shopping_list.members.add(*team[:size])
+                url = reverse(url_name, args=[shopping_list.pk])
+                data = {"members": [member.pk for member in team[:size]]}
+
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.put(url, data, format="json")
+
+                assert response.status_code == status.HTTP_200_OK
+                query_counts.append(len(queries))
+
+        assert query_counts[0] == query_counts[1]
+        assert query_counts[2] == query_counts[3]
+
+    def test_only_changed_memberships_are_recorded(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        shopping_list = create_shopping_list("my list", user)
+        bob = User.objects.create_user("bob", "bob@user.com", "something")
+        alice = User.objects.create_user("alice", "alice@user.com", "something")
+        shopping_list.members.add(bob)
+        ShoppingListChange.objects.all().delete()
+
+        client.put(
+            reverse("shopping-list-add-members", args=[shopping_list.pk]),
+            {"members": [bob.pk, alice.pk]},
+            format="json",
+        )
+        client.put(
+            reverse("shopping-list-remove-members", args=[shopping_list.pk]),
+            {"members": [alice.pk]},
+            format="json",
+        )
+        client.put(
+            reverse("shopping-list-remove-members", args=[shopping_list.pk]),
+            {"members": [alice.pk]},
+            format="json",
+        )
+
+        member_changes = ShoppingListChange.objects.filter(
+            kind=ShoppingListChange.MEMBER
+        ).order_by("id")
+        assert [(c.object_id, c.deleted) for c in member_changes] == [
+            (str(alice.pk), False),
+            (str(alice.pk), True),
+        ]
+
+
+@pytest.mark.django_db
+class TestCompiledSerializers:
+    @pytest.fixture
+    def populated_shopping_list(self, create_user, create_shopping_list):
+        user = create_user()
+        shopping_list = create_shopping_list("new list", user)
+        shopping_list.members.add(
+            User.objects.create_user("bob", "bob@user.com", "something")
+        )
+        for index in range(8):
+            ShoppingItem.objects.create(
+                name=f"Apples {index}",
+                purchased=index % 3 == 0,
+                shopping_list=shopping_list,
+            )
+        return shopping_list
+
+    @pytest.mark.parametrize(
+        "url_name, args, query_string",
+        [
+            ("all-shopping-lists", [], ""),
+            ("all-shopping-lists", [], "?pagination=cursor"),
+            ("shopping-list-detail", ["pk"], ""),
+            ("list-add-shopping-item", ["pk"], ""),
+            ("list-add-shopping-item", ["pk"], "?ordering=-name&pagination=cursor"),
+            ("shopping-item-detail", ["pk", "item_pk"], ""),
+            ("search_shopping-items", [], "?search=apples"),
+        ],
+    )
+    def test_responses_are_byte_identical(
+        self,
+        settings,
+        populated_shopping_list,
+        create_authenticated_client,
+        url_name,
+        args,
+        query_string,
+    ):
+        settings.SHOPPING_LIST_RESPONSE_CACHE_TIMEOUT = 0
+        client = create_authenticated_client(populated_shopping_list.members.first())
+        kwargs = {
+            "pk": populated_shopping_list.pk,
+            "item_pk": populated_shopping_list.shopping_items.first().pk,
+        }
+        url = reverse(url_name, args=[kwargs[arg] for arg in args]) + query_string
+
+        compiled = client.get(url)
+        settings.SHOPPING_LIST_COMPILED_SERIALIZERS = False
+        uncompiled = client.get(url)
+
+        assert compiled.status_code == status.HTTP_200_OK
+        assert compiled.content == uncompiled.content
+
+    def test_flat_serializers_read_values(self):
+        assert compile_serializer(ShoppingItemSerializer).flat
+        assert not compile_serializer(ShoppingListSerializer).flat
+
+    def test_related_fields_are_not_compiled(self):
+        with pytest.raises(ImproperlyConfigured):
+            compile_serializer(SyncShoppingItemSerializer)
+
+
+@pytest.mark.django_db
+class TestStreamingResponses:
+    @pytest.fixture
+    def populated_shopping_list(self, create_user, create_shopping_list):
+        shopping_list = create_shopping_list("new list", create_user())
+        for index in range(7):
+            ShoppingItem.objects.create(
+                name=f"Apples {index}",
+                purchased=index % 2 == 0,
+                shopping_list=shopping_list,
+            )
+        return shopping_list
+
+    @pytest.mark.parametrize("compiled", [True, False])
+    def test_items_stream_as_one_array(
+        self,
+        settings,
+        populated_shopping_list,
+        create_authenticated_client,
+        compiled,
+    ):
+        settings.SHOPPING_LIST_COMPILED_SERIALIZERS = compiled
+        settings.SHOPPING_LIST_STREAM_CHUNK_SIZE = 3
+        client = create_authenticated_client(populated_shopping_list.members.get())
+        url = reverse("list-add-shopping-item", args=[populated_shopping_list.pk])
+
+        response = client.get(url + "?stream=1&ordering=name")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.streaming
+        assert response["Content-Type"] == "application/json"
+        chunks = list(response.streaming_content)
+        # The brackets, then one chunk per 3 items.
+        assert len(chunks) == 2 + 3
+        items = ShoppingItem.objects.order_by("name")
+        assert b"".join(chunks) == JSONRenderer().render(
+            ShoppingItemSerializer(items, many=True).data
+        )
+
+    def test_empty_stream_is_an_empty_array(
+        self, create_user, create_authenticated_client, create_shopping_list
+    ):
+        user = create_user()
+        client = create_authenticated_client(user)
+        shopping_list = create_shopping_list("new list", user)
+        url = reverse("list-add-shopping-item", args=[shopping_list.pk])
+
+        response = client.get(url + "?stream=1")
+
+        assert b"".join(response.streaming_content) == b"[]"
+
+    def test_search_streams_ranked_items(
+        self, populated_shopping_list, create_authenticated_client
+    ):
+        client = create_authenticated_client(populated_shopping_list.members.get())
+
+        response = client.get(
+            reverse("search_shopping-items") + "?search=apples&stream=1"
+        )
+
+        assert len(json.loads(b"".join(response.streaming_content))) == 7
+
+    def test_streamed_responses_are_not_cached(
+        self, populated_shopping_list, create_authenticated_client
+    ):
+        client = create_authenticated_client(populated_shopping_list.members.get())
+        url = reverse("list-add-shopping-item", args=[populated_shopping_list.pk])
+
+        first = client.get(url + "?stream=1")
+        b"".join(first.streaming_content)
+        second = client.get(url + "?stream=1")
+
+        assert second.streaming
+        assert first["ETag"] == second["ETag"]
+        assert (
+            client.get(url + "?stream=1", HTTP_IF_NONE_MATCH=first["ETag"]).status_code
+            == 304
+        )
+
+
+@pytest.mark.django_db
+class TestExport:
+    @pytest.fixture
+    def shopping_lists(self, create_user, create_shopping_list):
+        user = create_user()
+        bob = User.objects.create_user("bob", "bob@user.com", "something")
+        groceries = create_shopping_list("Groceries", user)
+        groceries.members.add(bob)
+        ShoppingItem.objects.create(
+            name="Bananas", purchased=True, shopping_list=groceries
+        )
+        ShoppingItem.objects.create(
+            name="Apples", purchased=False, shopping_list=groceries
+        )
+        hardware = create_shopping_list("Hardware", user)
+        ShoppingItem.objects.create(
+            name="Nails", purchased=False, shopping_list=hardware
+        )
+        hidden = create_shopping_list("Hidden", bob)
+        ShoppingItem.objects.create(
+            name="Secret", purchased=False, shopping_list=hidden
+        )
+        return user, bob, groceries, hardware
+
+    def test_ndjson_export_groups_records_by_list(
+        self, shopping_lists, create_authenticated_client
+    ):
+        user, bob, groceries, hardware = shopping_lists
+        client = create_authenticated_client(user)
+
+        response = client.get(reverse("export"))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"] == "application/x-ndjson"
+        records = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).splitlines()
+        ]
+        by_list = {}
+        for record in records:
+            shopping_list = record.get("shopping_list", record["id"])
+            by_list.setdefault(shopping_list, []).append(
+                (record["type"], record.get("name", record.get("username")))
+            )
+        assert by_list == {
+            str(groceries.pk): [
+                ("list", "Groceries"),
+                ("member", "bob"),
+                ("member", "normalUser"),
+                ("item", "Apples"),
+                ("item", "Bananas"),
+            ],
+            str(hardware.pk): [
+                ("list", "Hardware"),
+                ("member", "normalUser"),
+                ("item", "Nails"),
+            ],
+        }
+        assert list(by_list) == sorted(by_list, key=uuid.UUID)
+        item = next(record for record in records if record.get("name") == "Bananas")
+        assert item == {
+            "type": "item",
+            "shopping_list": str(groceries.pk),
+            "id": str(groceries.shopping_items.get(name="Bananas").pk),
+            "name": "Bananas",
+            "purchased": True,
+        }
+
+    def test_csv_export(self, shopping_lists, create_authenticated_client):
+        user, bob, groceries, hardware = shopping_lists
+        client = create_authenticated_client(user)
+
+        response = client.get(reverse("export"), {"export_format": "csv"})
+
+        assert response["Content-Type"] == "text/csv; charset=utf-8"
+        assert response["Content-Disposition"] == (
+            'attachment; filename="shopping-lists.csv"'
+        )
+        rows = list(
+            csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode()))
+        )
+        assert len(rows) == 8
+        nails = next(row for row in rows if row["name"] == "Nails")
+        assert nails["type"] == "item"
+        assert nails["shopping_list"] == str(hardware.pk)
+        assert nails["purchased"] == "false"
+        assert next(row for row in rows if row["name"] == "bob")["id"] == str(bob.pk)
+
+    def test_export_reads_one_query_in_chunks(
+        self, settings, shopping_lists, create_authenticated_client
+    ):
+        settings.SHOPPING_LIST_STREAM_CHUNK_SIZE = 3
+        client = create_authenticated_client(shopping_lists[0])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse("export"))
+            chunks = list(response.streaming_content)
+
+        assert len(chunks) == 3
+        export_queries = [
+            q["sql"] for q in queries if "shopping_list_shoppingitem" in q["sql"]
+        ]
+        assert len(export_queries) == 1
+        assert "UNION ALL" in export_queries[0]
+
+    def test_unknown_export_format_returns_400(
+        self, create_user, create_authenticated_client
+    ):
+        client = create_authenticated_client(create_user())
+
+        response = client.get(reverse("export"), {"export_format": "xml"})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_export_under_asgi(self, shopping_lists):
+        user = shopping_lists[0]
+
+        async def read_export():
+            client = AsyncClient()
+            await client.aforce_login(user)
+            response = await client.get(reverse("export"), {"export_format": "csv"})
+            return b"".join([chunk async for chunk in response.streaming_content])
+
+        rows = list(csv.DictReader(io.StringIO(async_to_sync(read_export)().decode())))
+        assert len(rows) == 8
+        assert {row["name"] for row in rows if row["type"] == "list"} == {
+            "Groceries",
+            "Hardware",
+        }
+
+
+@pytest.mark.django_db
+class TestCachedTokenAuthentication:
+    @pytest.fixture
+    def token_client(self, settings, create_user):
+        settings.SHOPPING_LIST_TOKEN_CACHE_TIMEOUT = 60
+        user = create_user()
+        token = Token.objects.create(user=user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        return client, user, token
+
+    @staticmethod
+    def token_queries(queries):
+        return [q["sql"] for q in queries if "authtoken_token" in q["sql"]]
+
+    def test_token_is_looked_up_once(self, token_client):
+        client, user, token = token_client
+        url = reverse("all-shopping-lists")
+
+        with CaptureQueriesContext(connection) as first:
+            assert client.get(url).status_code == status.HTTP_200_OK
+        with CaptureQueriesContext(connection) as second:
+            response = client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(self.token_queries(first)) == 1
+        assert self.token_queries(second) == []
+
+    def test_credentials_are_not_cached(self, token_client):
+        client, user, token = token_client
+        client.get(reverse("all-shopping-lists"))
+
+        cached = cache.get(_token_cache_key(token.key))
+        assert cached is not None
+        assert token.key not in repr(cached)
+        assert user.password not in repr(cached)
+
+    def test_cached_user_loads_its_password_when_needed(self, token_client):
+        client, user, token = token_client
+        client.get(reverse("all-shopping-lists"))
+
+        authenticated, _ = CachedTokenAuthentication().authenticate_credentials(
+            token.key
+        )
+
+        assert authenticated == user
+        assert authenticated.username == "normalUser"
+        assert "password" in authenticated.get_deferred_fields()
+        assert authenticated.check_password("something")
+
+    def test_cache_can_be_disabled(self, settings, token_client):
+        settings.SHOPPING_LIST_TOKEN_CACHE_TIMEOUT = 0
+        client, user, token = token_client
+        url = reverse("all-shopping-lists")
+        client.get(url)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(self.token_queries(queries)) == 1
+
+    def test_deleted_token_is_rejected(self, token_client):
+        client, user, token = token_client
+        url = reverse("all-shopping-lists")
+        client.get(url)
+
+        token.delete()
+        response = client.get(url)
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_deactivated_user_is_rejected(self, token_client):
+        client, user, token = token_client
+        url = reverse("all-shopping-lists")
+        client.get(url)
+
+        user.is_active = False
+        user.save()
+        response = client.get(url)
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        assert response.data["detail"] == "User inactive or deleted."
+
+    def test_last_login_update_keeps_cached_token(self, token_client):
+        client, user, token = token_client
+        url = reverse("all-shopping-lists")
+        client.get(url)
+
+        with CaptureQueriesContext(connection) as queries:
+            update_last_login(None, user)
+            response = client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert self.token_queries(queries) == []
+
+    def test_unknown_token_is_rejected(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION="Token not-a-token")
+
+        response = client.get(reverse("all-shopping-lists"))
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        assert response.data["detail"] == "Invalid token."
+
+
+class TestSharedCacheChecks:
+    @pytest.mark.parametrize(
+        "setting, check_id",
+        [
+            ("SHOPPING_LIST_MEMBERSHIP_CACHE_TIMEOUT", "shopping_list.E001"),
+            ("SHOPPING_LIST_TOKEN_CACHE_TIMEOUT", "shopping_list.E002"),
+        ],
+    )
+    def test_cache_timeout_needs_shared_cache(self, settings, setting, check_id):
+        setattr(settings, setting, 60)
+        assert [error.id for error in check_shared_caches(None)] == [check_id]
+
+        settings.CACHES = {
+            "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+        }
+        assert check_shared_caches(None) == []
+
+        setattr(settings, setting, 0)
+        settings.CACHES = {
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        }
+        assert check_shared_caches(None) == []
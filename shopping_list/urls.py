@@ -1,8 +1,13 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.authtoken.views import obtain_auth_token
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
-from shopping_list.api import views
+from shopping_list.api import async_views, change_feed, views
+from shopping_list.instrumentation import metrics_view
+
+# Views with an async variant, served by it when SHOPPING_LIST_ASYNC_VIEWS is set.
+hot_views = async_views if settings.SHOPPING_LIST_ASYNC_VIEWS else views
 
 
 urlpatterns = [
@@ -10,12 +15,12 @@ urlpatterns = [
     path("api-token-auth/", obtain_auth_token, name="api-token-auth"),
     path(
         "api/shopping-lists/",
-        views.ListAddShoppingList.as_view(),
+        hot_views.ListAddShoppingList.as_view(),
         name="all-shopping-lists",
     ),
     path(
         "api/shopping-lists/<uuid:pk>/",
-        views.ShoppingListDetail.as_view(),
+        hot_views.ShoppingListDetail.as_view(),
         name="shopping-list-detail",
     ),
     path(
@@ -30,9 +35,14 @@ urlpatterns = [
     ),
     path(
         "api/shopping-lists/<uuid:pk>/shopping-items/",
-        views.ListAddShoppingItem.as_view(),
+        hot_views.ListAddShoppingItem.as_view(),
         name="list-add-shopping-item",
     ),
+    path(
+        "api/shopping-lists/<uuid:pk>/shopping-items/bulk/",
+        views.BulkShoppingItems.as_view(),
+        name="bulk-shopping-items",
+    ),
     path(
         "api/shopping-lists/<uuid:pk>/shopping-items/<uuid:item_pk>/",
         views.ShoppingItemDetail.as_view(),
@@ -40,9 +50,13 @@ urlpatterns = [
     ),
     path(
         "api/search-shopping-items/",
-        views.SearchShoppingItems.as_view(),
+        hot_views.SearchShoppingItems.as_view(),
         name="search_shopping-items",
     ),
+    path("api/changes/", change_feed.change_feed, name="change-feed"),
+    path("api/sync/", views.SyncShoppingLists.as_view(), name="sync"),
+    path("api/export/", views.ExportShoppingLists.as_view(), name="export"),
+    path("metrics", metrics_view, name="metrics"),
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
     path(
         "api/docs/",